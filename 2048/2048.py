@@ -53,140 +53,413 @@ GRID_OFFSET_Y = 40
 
 import random
 
-def draw_grid(grid, score, state):
-    fb.fill(COLOR_BG)
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            val = grid[y][x]
-            tx = GRID_OFFSET_X + x * TILE_SIZE
-            ty = GRID_OFFSET_Y + y * TILE_SIZE
-            color = get_tile_color(val)
-            fb.fill_rect(tx, ty, TILE_SIZE-4, TILE_SIZE-4, color)
-            if val:
-                fb.text(str(val), tx+TILE_SIZE//2-8, ty+TILE_SIZE//2-8, COLOR_TEXT)
+# Bitboard: the board is one int holding sixteen 4-bit tile exponents
+# (0 = empty, e = tile 2**e). Row y sits in bits 16*y..16*y+15 and column
+# x is nibble x of its row, so "left" is towards the low nibble.
+ROW_MASK = 0xFFFF
+MAX_EXP = 15
+# Slid rows are memoised on first use instead of precomputing all 65536;
+# the tables are dropped if they ever grow past this many entries
+ROW_CACHE_LIMIT = 8192
+_left_cache = {}
+_right_cache = {}
+
+def _slide_row(row):
+    # Slide and merge one packed row towards nibble 0. Returns (row, score)
+    tiles = [(row >> (4 * i)) & 0xF for i in range(GRID_SIZE)]
+    tiles = [e for e in tiles if e]
+    out = []
+    score = 0
+    i = 0
+    while i < len(tiles):
+        e = tiles[i]
+        if i + 1 < len(tiles) and tiles[i + 1] == e and e < MAX_EXP:
+            e += 1
+            score += 1 << e
+            i += 1
+        out.append(e)
+        i += 1
+    new_row = 0
+    for i, e in enumerate(out):
+        new_row |= e << (4 * i)
+    return new_row, score
+
+def reverse_row(row):
+    return ((row & 0xF) << 12) | ((row & 0xF0) << 4) | ((row >> 4) & 0xF0) | (row >> 12)
+
+def row_left(row):
+    hit = _left_cache.get(row)
+    if hit is None:
+        if len(_left_cache) >= ROW_CACHE_LIMIT:
+            _left_cache.clear()
+        hit = _left_cache[row] = _slide_row(row)
+    return hit
+
+def row_right(row):
+    hit = _right_cache.get(row)
+    if hit is None:
+        if len(_right_cache) >= ROW_CACHE_LIMIT:
+            _right_cache.clear()
+        new_row, score = _slide_row(reverse_row(row))
+        hit = _right_cache[row] = (reverse_row(new_row), score)
+    return hit
+
+def transpose(board):
+    # Swap rows and columns with masks and shifts: nibbles first, then bytes
+    a1 = board & 0xF0F00F0FF0F00F0F
+    a2 = board & 0x0000F0F00000F0F0
+    a3 = board & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+def _apply_rows(board, slide):
+    result = 0
+    score = 0
+    for shift in (0, 16, 32, 48):
+        new_row, gained = slide((board >> shift) & ROW_MASK)
+        result |= new_row << shift
+        score += gained
+    return result, score
+
+def move_board(board, direction):
+    """Slide the board. Returns (new board, score gained)."""
+    if direction == 'left':
+        return _apply_rows(board, row_left)
+    if direction == 'right':
+        return _apply_rows(board, row_right)
+    # Columns become rows after a transpose; up is left, down is right
+    result, score = _apply_rows(transpose(board), row_left if direction == 'up' else row_right)
+    return transpose(result), score
+
+def tile_value(board, x, y):
+    e = (board >> (16 * y + 4 * x)) & 0xF
+    return 1 << e if e else 0
+
+def board_to_grid(board):
+    return [[tile_value(board, x, y) for x in range(GRID_SIZE)] for y in range(GRID_SIZE)]
+
+def empty_cells(board):
+    return [i for i in range(GRID_SIZE * GRID_SIZE) if not (board >> (4 * i)) & 0xF]
+
+# ---------- Expectimax solver ----------
+DIRECTIONS = ('up', 'down', 'left', 'right')
+HINT_BUDGET_MS = 300    # Thinking time for a hint
+AUTO_BUDGET_MS = 150    # Thinking time per auto-play move
+MAX_DEPTH = 6           # Moves to look ahead at most
+PROB_CUTOFF = 0.0001    # Skip chance branches less likely than this
+SEARCH_CACHE_LIMIT = 4096
+
+# Heuristic weights (monotone rows, free cells and merge chances are good)
+LOST_PENALTY = 200000.0
+MONO_POWER = 4.0
+MONO_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGE_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+_heur_cache = {}
+
+class SearchTimeout(Exception):
+    pass
+
+def _row_heuristic(row):
+    tiles = [(row >> (4 * i)) & 0xF for i in range(GRID_SIZE)]
+    total = 0.0
+    empty = 0
+    merges = 0
+    prev = 0
+    run = 0
+    for e in tiles:
+        total += e ** SUM_POWER
+        if e == 0:
+            empty += 1
+        else:
+            if prev == e:
+                run += 1
+            elif run:
+                merges += 1 + run
+                run = 0
+            prev = e
+    if run:
+        merges += 1 + run
+    mono_left = 0.0
+    mono_right = 0.0
+    for i in range(GRID_SIZE - 1):
+        a = tiles[i] ** MONO_POWER
+        b = tiles[i + 1] ** MONO_POWER
+        if tiles[i] > tiles[i + 1]:
+            mono_left += a - b
+        else:
+            mono_right += b - a
+    return (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGE_WEIGHT * merges
+            - MONO_WEIGHT * min(mono_left, mono_right) - SUM_WEIGHT * total)
+
+def row_heuristic(row):
+    hit = _heur_cache.get(row)
+    if hit is None:
+        if len(_heur_cache) >= ROW_CACHE_LIMIT:
+            _heur_cache.clear()
+        hit = _heur_cache[row] = _row_heuristic(row)
+    return hit
+
+def heuristic(board):
+    """Score a position from its rows and its columns."""
+    cols = transpose(board)
+    value = 0.0
+    for shift in (0, 16, 32, 48):
+        value += row_heuristic((board >> shift) & ROW_MASK)
+        value += row_heuristic((cols >> shift) & ROW_MASK)
+    return value
+
+def _max_node(board, depth, prob, cache, deadline):
+    # Player to move: value of the best move, 0 if there is none
+    best = 0.0
+    for direction in DIRECTIONS:
+        new_board = move_board(board, direction)[0]
+        if new_board != board:
+            value = _chance_node(new_board, depth, prob, cache, deadline)
+            if value > best:
+                best = value
+    return best
+
+def _chance_node(board, depth, prob, cache, deadline):
+    # A tile is about to spawn: average over every cell and tile value
+    if depth <= 0 or prob < PROB_CUTOFF:
+        return heuristic(board)
+    hit = cache.get(board)
+    if hit is not None and hit[0] >= depth:
+        return hit[1]
+    if deadline is not None and time.ticks_diff(deadline, time.ticks_ms()) < 0:
+        raise SearchTimeout()
+    empty = empty_cells(board)
+    n = len(empty)
+    total = 0.0
+    for i in empty:
+        total += 0.9 * _max_node(board | (1 << (4 * i)), depth - 1, prob * 0.9 / n, cache, deadline)
+        total += 0.1 * _max_node(board | (2 << (4 * i)), depth - 1, prob * 0.1 / n, cache, deadline)
+    value = total / n
+    if len(cache) < SEARCH_CACHE_LIMIT:
+        cache[board] = (depth, value)
+    return value
+
+def best_move(board, budget_ms=HINT_BUDGET_MS, max_depth=MAX_DEPTH):
+    """
+    Pick a move by depth-limited expectimax with iterative deepening.
+
+    Each depth is searched in full before the next; when budget_ms runs
+    out mid-search the deepest finished answer is used. Pass
+    budget_ms=None for a fixed-depth search. Returns None if no move
+    changes the board.
+    """
+    deadline = None if budget_ms is None else time.ticks_add(time.ticks_ms(), budget_ms)
+    moves = [(d, nb) for d, nb in ((d, move_board(board, d)[0]) for d in DIRECTIONS) if nb != board]
+    if not moves:
+        return None
+    best = moves[0][0]
+    for depth in range(1, max_depth + 1):
+        # Fresh table per depth: entries hold values for that search's depths
+        cache = {}
+        try:
+            scored = [(_chance_node(nb, depth, 1.0, cache, deadline), d) for d, nb in moves]
+        except SearchTimeout:
+            break
+        best = max(scored)[1]
+        if deadline is None and depth == max_depth:
+            break
+    return best
+
+def benchmark(games=3, depth=1, seed=1):
+    """Auto-play seeded games headless; print average score and moves/s."""
+    total_score = 0
+    total_moves = 0
+    start = time.ticks_ms()
+    for g in range(games):
+        random.seed(seed + g)
+        board = add_tile(add_tile(0))
+        score = 0
+        while True:
+            direction = best_move(board, None, depth)
+            if direction is None:
+                break
+            board, gained = move_board(board, direction)
+            board = add_tile(board)
+            score += gained
+            total_moves += 1
+        top = max(tile_value(board, x, y) for y in range(GRID_SIZE) for x in range(GRID_SIZE))
+        print("game %d: score %d, top tile %d" % (g, score, top))
+        total_score += score
+    ms = max(1, time.ticks_diff(time.ticks_ms(), start))
+    print("avg score %d, %d moves, %d moves/s"
+          % (total_score // games, total_moves, total_moves * 1000 // ms))
+
+# ---------- Drawing ----------
+ANIM_FRAMES = 4   # Slide steps, the last one being the settled board
+FRAME_MS = 25     # Budget per animation frame
+HUD_HEIGHT = 28   # Score line, cleared on its own when it changes
+
+def slot_xy(x, y):
+    # Top-left pixel of a grid slot
+    return GRID_OFFSET_X + x * TILE_SIZE, GRID_OFFSET_Y + y * TILE_SIZE
+
+def draw_tile(px, py, val):
+    fb.fill_rect(px, py, TILE_SIZE-4, TILE_SIZE-4, get_tile_color(val))
+    if val:
+        fb.text(str(val), px+TILE_SIZE//2-8, py+TILE_SIZE//2-8, COLOR_TEXT)
+
+def draw_hud(score, state, status=""):
+    fb.fill_rect(0, 0, SCREEN_WIDTH, HUD_HEIGHT, COLOR_BG)
     fb.text(f"Score: {score}", 10, 10, COLOR_TEXT)
     if state == "win":
         fb.text("YOU WIN!", 120, 10, COLOR_WIN)
     elif state == "lose":
         fb.text("GAME OVER", 120, 10, COLOR_LOSE)
-    fb.text("Q: Quit", 10, 300, COLOR_TEXT)
-    fb.text("Arrows: Move", 120, 300, COLOR_TEXT)
+    if status:
+        fb.text(status, 200, 10, COLOR_WIN)
 
-def draw_grid_with_offsets(grid, score, state, offsets=None):
+def draw_grid(grid, score, state, status=""):
     fb.fill(COLOR_BG)
     for y in range(GRID_SIZE):
         for x in range(GRID_SIZE):
-            val = grid[y][x]
-            dx, dy = 0, 0
-            if offsets and (y, x) in offsets:
-                dx, dy = offsets[(y, x)]
-            tx = GRID_OFFSET_X + x * TILE_SIZE + dx
-            ty = GRID_OFFSET_Y + y * TILE_SIZE + dy
-            color = get_tile_color(val)
-            fb.fill_rect(tx, ty, TILE_SIZE-4, TILE_SIZE-4, color)
-            if val:
-                fb.text(str(val), tx+TILE_SIZE//2-8, ty+TILE_SIZE//2-8, COLOR_TEXT)
-    fb.text(f"Score: {score}", 10, 10, COLOR_TEXT)
-    if state == "win":
-        fb.text("YOU WIN!", 120, 10, COLOR_WIN)
-    elif state == "lose":
-        fb.text("GAME OVER", 120, 10, COLOR_LOSE)
-    fb.text("Q: Quit", 10, 300, COLOR_TEXT)
-    fb.text("Arrows: Move", 120, 300, COLOR_TEXT)
+            px, py = slot_xy(x, y)
+            draw_tile(px, py, grid[y][x])
+    draw_hud(score, state, status)
+    fb.text("Q:Quit Arrows:Move H:Hint a:Auto", 10, 300, COLOR_TEXT)
+
+def animate(board, moves, merges):
+    """
+    Slide the travelling tiles from their old slots to their new ones.
 
-def add_tile(grid):
-    empty = [(y, x) for y in range(GRID_SIZE) for x in range(GRID_SIZE) if grid[y][x] == 0]
+    Only the moving tiles are touched: each frame erases the rectangles
+    drawn last frame and paints the tiles at their next position. Tiles
+    that stay put but are being merged into are repainted under them.
+    """
+    sources = set((fx, fy) for fx, fy, _, _, _ in moves)
+    targets = [(x, y, tile_value(board, x, y)) for x, y, _ in merges if (x, y) not in sources]
+    drawn = [slot_xy(fx, fy) for fx, fy, _, _, _ in moves]
+    for frame in range(1, ANIM_FRAMES):
+        start = time.ticks_ms()
+        for px, py in drawn:
+            fb.fill_rect(px, py, TILE_SIZE-4, TILE_SIZE-4, COLOR_BG)
+        for x, y, val in targets:
+            px, py = slot_xy(x, y)
+            draw_tile(px, py, val)
+        drawn = []
+        for fx, fy, tx, ty, val in moves:
+            px = GRID_OFFSET_X + (fx * (ANIM_FRAMES - frame) + tx * frame) * TILE_SIZE // ANIM_FRAMES
+            py = GRID_OFFSET_Y + (fy * (ANIM_FRAMES - frame) + ty * frame) * TILE_SIZE // ANIM_FRAMES
+            draw_tile(px, py, val)
+            drawn.append((px, py))
+        wait = FRAME_MS - time.ticks_diff(time.ticks_ms(), start)
+        if wait > 0:
+            time.sleep_ms(wait)
+    for px, py in drawn:
+        fb.fill_rect(px, py, TILE_SIZE-4, TILE_SIZE-4, COLOR_BG)
+
+def draw_changed(old_board, new_board, moves):
+    """Repaint the slots whose tile changed, plus every slot a tile left or entered."""
+    cells = set((tx, ty) for _, _, tx, ty, _ in moves)
+    cells.update((fx, fy) for fx, fy, _, _, _ in moves)
+    for y in range(GRID_SIZE):
+        for x in range(GRID_SIZE):
+            if (x, y) in cells or tile_value(old_board, x, y) != tile_value(new_board, x, y):
+                px, py = slot_xy(x, y)
+                draw_tile(px, py, tile_value(new_board, x, y))
+
+def add_tile(board):
+    empty = empty_cells(board)
     if empty:
-        y, x = random.choice(empty)
-        grid[y][x] = 2 if random.random() < 0.9 else 4
+        i = random.choice(empty)
+        board |= (1 if random.random() < 0.9 else 2) << (4 * i)
+    return board
 
-def move_grid(grid, direction):
-    moved = False
-    total_score = 0
-    def slide(row):
-        new_row = [v for v in row if v]
-        score_gained = 0
-        i = 0
-        while i < len(new_row)-1:
-            if new_row[i] == new_row[i+1]:
-                new_row[i] *= 2
-                score_gained += new_row[i]
-                new_row.pop(i+1)
-                i += 1
-            i += 1
-        new_row += [0]*(GRID_SIZE-len(new_row))
-        return new_row, score_gained
+def _line_moves(exps):
+    # Follow each tile of one line, given in the order tiles slide
+    # towards. Returns (src, dst, merged) per tile, matching _slide_row
+    out = []
+    dst = -1
+    last = 0
+    for src in range(GRID_SIZE):
+        e = exps[src]
+        if not e:
+            continue
+        if e == last and e < MAX_EXP:
+            out.append((src, dst, True))
+            last = 0
+        else:
+            dst += 1
+            out.append((src, dst, False))
+            last = e
+    return out
+
+def _line_cells(direction, k):
+    # (x, y) cells of row or column k, starting from the side tiles slide to
+    if direction == 'left':
+        return [(i, k) for i in range(GRID_SIZE)]
+    if direction == 'right':
+        return [(GRID_SIZE - 1 - i, k) for i in range(GRID_SIZE)]
     if direction == 'up':
-        for x in range(GRID_SIZE):
-            col = [grid[y][x] for y in range(GRID_SIZE)]
-            new_col, score_gained = slide(col)
-            if col != new_col:
-                moved = True
-            total_score += score_gained
-            for y in range(GRID_SIZE):
-                grid[y][x] = new_col[y]
-    elif direction == 'down':
-        for x in range(GRID_SIZE):
-            col = [grid[y][x] for y in range(GRID_SIZE)][::-1]
-            new_col, score_gained = slide(col)
-            new_col = new_col[::-1]
-            if [grid[y][x] for y in range(GRID_SIZE)] != new_col:
-                moved = True
-            total_score += score_gained
-            for y in range(GRID_SIZE):
-                grid[y][x] = new_col[y]
-    elif direction == 'left':
-        for y in range(GRID_SIZE):
-            row = grid[y]
-            new_row, score_gained = slide(row)
-            if row != new_row:
-                moved = True
-            total_score += score_gained
-            grid[y] = new_row
-    elif direction == 'right':
-        for y in range(GRID_SIZE):
-            row = grid[y][::-1]
-            new_row, score_gained = slide(row)
-            new_row = new_row[::-1]
-            if grid[y] != new_row:
-                moved = True
-            total_score += score_gained
-            grid[y] = new_row
-    return moved, total_score
-
-def check_win(grid):
-    for row in grid:
-        if 2048 in row:
+        return [(k, i) for i in range(GRID_SIZE)]
+    return [(k, GRID_SIZE - 1 - i) for i in range(GRID_SIZE)]
+
+def move_grid(board, direction):
+    """
+    Slide the board. Returns (new board, moved, score, moves, merges):
+    moves holds (from_x, from_y, to_x, to_y, value) for every tile that
+    travels, merges holds (x, y, new value) for every combined slot.
+    """
+    new_board, score = move_board(board, direction)
+    moves = []
+    merges = []
+    if new_board != board:
+        for k in range(GRID_SIZE):
+            cells = _line_cells(direction, k)
+            exps = [(board >> (16 * y + 4 * x)) & 0xF for x, y in cells]
+            for src, dst, merged in _line_moves(exps):
+                fx, fy = cells[src]
+                tx, ty = cells[dst]
+                if src != dst:
+                    moves.append((fx, fy, tx, ty, 1 << exps[src]))
+                if merged:
+                    merges.append((tx, ty, tile_value(new_board, tx, ty)))
+    return new_board, new_board != board, score, moves, merges
+
+def check_win(board):
+    # Any nibble at exponent 11 (2048) or above
+    while board:
+        if board & 0xF >= 11:
             return True
+        board >>= 4
     return False
 
-def check_lose(grid):
-    for y in range(GRID_SIZE):
-        for x in range(GRID_SIZE):
-            if grid[y][x] == 0:
-                return False
-            for dy, dx in ((0,1),(1,0)):
-                ny, nx = y+dy, x+dx
-                if ny<GRID_SIZE and nx<GRID_SIZE and grid[y][x]==grid[ny][nx]:
-                    return False
+def check_lose(board):
+    if empty_cells(board):
+        return False
+    for direction in ('up', 'down', 'left', 'right'):
+        if move_board(board, direction)[0] != board:
+            return False
     return True
 
 def main():
-    grid = [[0]*GRID_SIZE for _ in range(GRID_SIZE)]
+    board = 0
     score = 0
     state = "playing"
-    add_tile(grid)
-    add_tile(grid)
+    board = add_tile(board)
+    board = add_tile(board)
     temp = bytearray(1)
-    prev_grid = [[0]*GRID_SIZE for _ in range(GRID_SIZE)]
+    auto = False
+    status = ""
+    draw_grid(board_to_grid(board), score, state, status)
     while True:
-        draw_grid(grid, score, state)
         if state != "playing":
             time.sleep(1)
             break
         # Input
-        moved, s = False, 0  # Always initialize
         direction = None
+        hud_changed = False
         if keyboard.readinto(temp):
             key = temp[0]
             if key in (ord('q'), ord('Q')):
@@ -199,59 +472,37 @@ def main():
                 direction = 'right'
             elif key == 68: # Left
                 direction = 'left'
+            elif key in (ord('h'), ord('H')):
+                hint = best_move(board, HINT_BUDGET_MS)
+                status = "Hint: " + hint if hint else ""
+                hud_changed = True
+            elif key == ord('a'):  # 'A' is the up arrow code
+                auto = not auto
+                status = "AUTO" if auto else ""
+                hud_changed = True
+        if auto and direction is None:
+            direction = best_move(board, AUTO_BUDGET_MS)
+        elif direction and status.startswith("Hint"):
+            status = ""
+            hud_changed = True
         if direction:
-            # Copy grid for animation
-            for y in range(GRID_SIZE):
-                for x in range(GRID_SIZE):
-                    prev_grid[y][x] = grid[y][x]
-            moved, s = move_grid(grid, direction)
+            new_board, moved, s, moves, merges = move_grid(board, direction)
             if moved:
-                # Animate the slide
-                frames = 4  # Reduced from 5 to lower frame rate
-                for frame in range(1, frames+1):
-                    offsets = {}
-                    # Calculate offset based on direction only
-                    # Tiles slide from their "before" position in the direction of movement
-                    if direction == 'up':
-                        for y in range(GRID_SIZE):
-                            for x in range(GRID_SIZE):
-                                if grid[y][x] != 0:
-                                    # Find how far this tile should have slid from
-                                    # Only animate if grid changed
-                                    if prev_grid[y][x] != grid[y][x]:
-                                        # Tile came from below
-                                        dy = int((TILE_SIZE) * (frames-frame) / frames)
-                                        offsets[(y, x)] = (0, dy)
-                    elif direction == 'down':
-                        for y in range(GRID_SIZE):
-                            for x in range(GRID_SIZE):
-                                if grid[y][x] != 0:
-                                    if prev_grid[y][x] != grid[y][x]:
-                                        dy = int(-(TILE_SIZE) * (frames-frame) / frames)
-                                        offsets[(y, x)] = (0, dy)
-                    elif direction == 'left':
-                        for y in range(GRID_SIZE):
-                            for x in range(GRID_SIZE):
-                                if grid[y][x] != 0:
-                                    if prev_grid[y][x] != grid[y][x]:
-                                        dx = int((TILE_SIZE) * (frames-frame) / frames)
-                                        offsets[(y, x)] = (dx, 0)
-                    elif direction == 'right':
-                        for y in range(GRID_SIZE):
-                            for x in range(GRID_SIZE):
-                                if grid[y][x] != 0:
-                                    if prev_grid[y][x] != grid[y][x]:
-                                        dx = int(-(TILE_SIZE) * (frames-frame) / frames)
-                                        offsets[(y, x)] = (dx, 0)
-                    draw_grid_with_offsets(grid, score, state, offsets)
-                    time.sleep_ms(100)  # Increased from 20ms to reduce flicker
-                add_tile(grid)
+                animate(board, moves, merges)
+                new_board = add_tile(new_board)
+                draw_changed(board, new_board, moves)
+                board = new_board
                 score += s
-        if check_win(grid):
+                hud_changed = True
+        if check_win(board):
             state = "win"
-        elif check_lose(grid):
+            hud_changed = True
+        elif check_lose(board):
             state = "lose"
-        time.sleep_ms(60)
+            hud_changed = True
+        if hud_changed:
+            draw_hud(score, state, status)
+        time.sleep_ms(20)
     fb.fill(COLOR_BG)
     fb.text("Thanks for playing!", 80, 140, COLOR_TEXT)
     time.sleep(1)
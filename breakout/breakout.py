@@ -1,7 +1,10 @@
 # breakout.py - Simple Breakout clone for PicoCalc
 # Controls: Left/Right arrows to move paddle, Q to quit
+import os
+import random
 import time
 import picocalc
+from gameloop import GameLoop
 
 # Use PicoCalc keyboard module for non-blocking input
 from picocalc import keyboard
@@ -34,51 +37,210 @@ GAME_SPEED = 1.0  # Multiplier for overall game speed (increase for faster)
 
 BRICK_WIDTH = 38
 BRICK_HEIGHT = 12
-BRICK_ROWS = 5
+BRICK_ROWS = 10  # Most rows a level can have
 BRICK_COLS = 8
 BRICK_PADDING = 2
 BRICK_OFFSET_TOP = 40
+BRICK_OFFSET_LEFT = 10
+BRICK_PITCH_X = BRICK_WIDTH + BRICK_PADDING
+BRICK_PITCH_Y = BRICK_HEIGHT + BRICK_PADDING
+
+# The ball moves at most this far between collision tests, so it can't
+# pass through a brick or the paddle however fast it goes
+SWEEP_STEP = BALL_SIZE // 2
+
+# Levels are text files in LEVEL_DIR, played in name order. Each line is
+# a row of bricks, one character per column: '.' or space for a gap, and
+# B R G C M Y W for a blue/red/green/cyan/magenta/yellow/white brick.
+# Lower case marks a brick that drops a power-up. Lines starting with
+# ';' are comments. The directory is fixed: apps are exec'd without
+# __file__, so it can't be found relative to the script.
+LEVEL_DIR = "/sd/breakout/levels"
+BRICK_CHARS = "BRGCMYW"  # Index + 1 is the colour
+BRICK_COLOR_MASK = 7
+POWER_BRICK = 8          # Grid flag: brick drops a power-up
+DEFAULT_LEVEL = (
+    "RRRrRRRR",
+    "MMMMMmMM",
+    "YyYYYYYY",
+    "GGGGGGgG",
+    "CCCcCCCC",
+)
+
+# Balls and power-up drops come from fixed pools, so nothing is
+# allocated when one is spawned during play
+MAX_BALLS = 4
+MAX_DROPS = 4
+DROP_WIDTH = 16
+DROP_HEIGHT = 8
+DROP_SPEED = 2
+POWER_MULTI = 0  # Split the ball into three
+POWER_WIDE = 1   # Wider paddle for a while
+POWER_LIFE = 2   # Extra life
+POWER_LABELS = ("M", "W", "+")
+POWER_COLORS = (COLOR_CYAN, COLOR_GREEN, COLOR_RED)
+WIDE_PADDLE_WIDTH = 80
+WIDE_TICKS = 30 * 15  # 15 seconds of updates
+
+def brick_rect(row, col):
+    """Top-left corner of the brick slot at (row, col)."""
+    return col * BRICK_PITCH_X + BRICK_OFFSET_LEFT, row * BRICK_PITCH_Y + BRICK_OFFSET_TOP
+
+def parse_level(lines):
+    """
+    Parse level text into a brick grid.
+    Returns (grid, brick count); raises ValueError on a bad level.
+    """
+    grid = bytearray(BRICK_ROWS * BRICK_COLS)
+    count = 0
+    row = 0
+    for line in lines:
+        if line.startswith(";"):
+            continue
+        if row == BRICK_ROWS:
+            break
+        line = line.rstrip("\r\n")
+        for col in range(min(len(line), BRICK_COLS)):
+            ch = line[col]
+            if ch in ". ":
+                continue
+            color = BRICK_CHARS.find(ch.upper()) + 1
+            if not color:
+                raise ValueError("bad brick %r on row %d" % (ch, row + 1))
+            if ch.islower():
+                color |= POWER_BRICK
+            grid[row * BRICK_COLS + col] = color
+            count += 1
+        row += 1
+    if not count:
+        raise ValueError("level has no bricks")
+    return grid, count
+
+def load_levels(path=LEVEL_DIR):
+    """
+    Parse every .txt level in path, in name order. Files that can't be
+    read or parsed are skipped; with none left, the built-in level is
+    used. Returns a list of (grid, brick count).
+    """
+    levels = []
+    try:
+        names = sorted(name for name in os.listdir(path) if name.endswith(".txt"))
+    except OSError:
+        names = []
+    for name in names:
+        try:
+            with open(path + "/" + name) as f:
+                levels.append(parse_level(f))
+        except (OSError, ValueError):
+            pass
+    if not levels:
+        levels.append(parse_level(DEFAULT_LEVEL))
+    return levels
+
+class Ball:
+    """A ball from the pool; inactive balls are free for reuse."""
+    def __init__(self):
+        self.active = False
+        self.x = 0
+        self.y = 0
+        self.dx = 0
+        self.dy = 0
+        self.drawn_x = -1  # Where it was last drawn, -1 if not on screen
+        self.drawn_y = 0
+
+class Drop:
+    """A falling power-up from the pool."""
+    def __init__(self):
+        self.active = False
+        self.x = 0
+        self.y = 0
+        self.kind = POWER_MULTI
+        self.drawn_x = -1
+        self.drawn_y = 0
 
 # Game state
 class Game:
-    def __init__(self):
+    def __init__(self, loop=None):
+        self.loop = loop  # GameLoop, for per-level frame timing
         self.paddle_x = SCREEN_WIDTH // 2 - PADDLE_WIDTH // 2
-        self.ball_x = SCREEN_WIDTH // 2
-        self.ball_y = SCREEN_HEIGHT // 2
-        self.ball_dx = BALL_SPEED_X * GAME_SPEED
-        self.ball_dy = BALL_SPEED_Y * GAME_SPEED
+        self.paddle_width = PADDLE_WIDTH
+        self.wide_ticks = 0
         self.score = 0
         self.lives = 3
         self.running = True
         self.game_over = False
         self.won = False
+        self.key = bytearray(1)
+
+        # Object pools
+        self.balls = [Ball() for _ in range(MAX_BALLS)]
+        self.drops = [Drop() for _ in range(MAX_DROPS)]
 
         # Store previous positions for erasing
         self.prev_paddle_x = self.paddle_x
-        self.prev_ball_x = self.ball_x
-        self.prev_ball_y = self.ball_y
+        self.prev_paddle_width = self.paddle_width
         self.prev_score = 0
         self.prev_lives = 3
 
         # Track if we need full redraw
         self.needs_full_redraw = True
 
-        # Create bricks - list of (x, y, color, active)
-        self.bricks = []
-        colors = [COLOR_RED, COLOR_MAGENTA, COLOR_YELLOW, COLOR_GREEN, COLOR_CYAN]
+        # Bricks: grid[row * BRICK_COLS + col] is the brick's colour, with
+        # POWER_BRICK set if it drops a power-up; 0 if gone
+        self.levels = load_levels()
+        self.level_times = []  # Frame timing summary of each level played
+        self.grid = bytearray(BRICK_ROWS * BRICK_COLS)
+        self.erase_queue = []  # Grid indices of bricks hit since the last draw
+        self.start_level(0)
+
+    def start_level(self, level):
+        """Load a level's bricks and serve a fresh ball."""
+        grid, count = self.levels[level]
+        self.level = level
+        self.grid[:] = grid
+        self.active_bricks = count
+        self.erase_queue = []
+        self.set_paddle_width(PADDLE_WIDTH)
+        self.wide_ticks = 0
+        self.serve()
+        self.needs_full_redraw = True
 
-        for row in range(BRICK_ROWS):
-            for col in range(BRICK_COLS):
-                x = col * (BRICK_WIDTH + BRICK_PADDING) + 10
-                y = row * (BRICK_HEIGHT + BRICK_PADDING) + BRICK_OFFSET_TOP
-                color = colors[row % len(colors)]
-                self.bricks.append([x, y, color, True])  # x, y, color, active
+    def serve(self):
+        """Clear the balls and drops in play and launch a single ball."""
+        for ball in self.balls:
+            ball.active = False
+        for drop in self.drops:
+            drop.active = False
+        self.spawn_ball(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2,
+                        BALL_SPEED_X * GAME_SPEED, BALL_SPEED_Y * GAME_SPEED)
+
+    def spawn_ball(self, x, y, dx, dy):
+        """Take a ball from the pool. Returns False if all are in play."""
+        for ball in self.balls:
+            if not ball.active:
+                ball.active = True
+                ball.x = x
+                ball.y = y
+                ball.dx = dx
+                ball.dy = dy
+                return True
+        return False
+
+    def spawn_drop(self, x, y, kind):
+        """Take a power-up drop from the pool, if one is free."""
+        for drop in self.drops:
+            if not drop.active:
+                drop.active = True
+                drop.x = x
+                drop.y = y
+                drop.kind = kind
+                return True
+        return False
 
     def check_input(self):
         """Non-blocking input check using picocalc.keyboard.readinto()"""
-        temp = bytearray(1)
-        if keyboard.readinto(temp):
-            key = temp[0]
+        if keyboard.readinto(self.key):
+            key = self.key[0]
             # Arrow keys: 0xAE = left, 0xAF = right (per firmware font table)
             if key == 68:  # Left arrow
                 self.paddle_x -= PADDLE_SPEED
@@ -87,112 +249,228 @@ class Game:
             # Q or q to quit
             elif key in (ord('q'), ord('Q')):
                 self.running = False
-        # Keep paddle on screen
+        self.clamp_paddle()
+
+    def clamp_paddle(self):
+        """Keep paddle on screen"""
         if self.paddle_x < 0:
             self.paddle_x = 0
-        if self.paddle_x > SCREEN_WIDTH - PADDLE_WIDTH:
-            self.paddle_x = SCREEN_WIDTH - PADDLE_WIDTH
+        if self.paddle_x > SCREEN_WIDTH - self.paddle_width:
+            self.paddle_x = SCREEN_WIDTH - self.paddle_width
+
+    def set_paddle_width(self, width):
+        """Resize the paddle about its centre."""
+        self.paddle_x -= (width - self.paddle_width) // 2
+        self.paddle_width = width
+        self.clamp_paddle()
 
     def update(self):
         """Update game state"""
         if self.game_over or self.won:
             return
 
-        # Move ball
-        self.ball_x += self.ball_dx
-        self.ball_y += self.ball_dy
-
-        # Ball collision with walls
-        if self.ball_x <= 0 or self.ball_x >= SCREEN_WIDTH - BALL_SIZE:
-            self.ball_dx = -self.ball_dx
-            self.ball_x = max(0, min(SCREEN_WIDTH - BALL_SIZE, self.ball_x))
-
-        if self.ball_y <= 0:
-            self.ball_dy = -self.ball_dy
-            self.ball_y = 0
+        in_play = False
+        for ball in self.balls:
+            if ball.active:
+                self.move_ball(ball)
+                in_play = in_play or ball.active
+        self.move_drops()
+
+        if self.wide_ticks:
+            self.wide_ticks -= 1
+            if not self.wide_ticks:
+                self.set_paddle_width(PADDLE_WIDTH)
+
+        # Level cleared - move on to the next one, or win
+        if self.active_bricks == 0:
+            self.record_level_time()
+            if self.level + 1 < len(self.levels):
+                self.start_level(self.level + 1)
+            else:
+                self.won = True
+            return
 
-        # Ball falls off bottom - lose life
-        if self.ball_y >= SCREEN_HEIGHT:
+        # Every ball fell off the bottom - lose life
+        if not in_play:
             self.lives -= 1
             self.needs_full_redraw = True  # Redraw everything when life lost
             if self.lives <= 0:
                 self.game_over = True
+                self.record_level_time()
             else:
-                # Reset ball
-                self.ball_x = SCREEN_WIDTH // 2
-                self.ball_y = SCREEN_HEIGHT // 2
-                self.ball_dy = -abs(self.ball_dy)
-
-        # Ball collision with paddle
-        if (self.ball_y + BALL_SIZE >= PADDLE_Y and
-            self.ball_y < PADDLE_Y + PADDLE_HEIGHT and
-            self.ball_x + BALL_SIZE >= self.paddle_x and
-            self.ball_x <= self.paddle_x + PADDLE_WIDTH):
-
-            self.ball_dy = -abs(self.ball_dy)  # Always bounce up
-            self.ball_y = PADDLE_Y - BALL_SIZE  # Place ball on top of paddle
-
-            # Add spin based on where ball hits paddle
-            hit_pos = (self.ball_x + BALL_SIZE/2 - self.paddle_x) / PADDLE_WIDTH
-            self.ball_dx = int((hit_pos - 0.5) * 6)  # -3 to +3
-
-        # Ball collision with bricks
-        for brick in self.bricks:
-            if not brick[3]:  # Skip inactive bricks
+                self.serve()
+
+    def move_ball(self, ball):
+        """Move one ball, bouncing it off walls, the paddle and bricks."""
+        # Move the ball in small steps, testing collisions after each one
+        steps = int(max(abs(ball.dx), abs(ball.dy)) // SWEEP_STEP) + 1
+        step_x = ball.dx / steps
+        step_y = ball.dy / steps
+        for _ in range(steps):
+            ball.x += step_x
+            ball.y += step_y
+
+            # Ball collision with walls
+            if ball.x <= 0 or ball.x >= SCREEN_WIDTH - BALL_SIZE:
+                ball.dx = -ball.dx
+                step_x = -step_x
+                ball.x = max(0, min(SCREEN_WIDTH - BALL_SIZE, ball.x))
+
+            if ball.y <= 0:
+                ball.dy = -ball.dy
+                step_y = -step_y
+                ball.y = 0
+
+            # Ball collision with paddle
+            if (step_y > 0 and
+                ball.y + BALL_SIZE >= PADDLE_Y and
+                ball.y < PADDLE_Y + PADDLE_HEIGHT and
+                ball.x + BALL_SIZE >= self.paddle_x and
+                ball.x <= self.paddle_x + self.paddle_width):
+
+                ball.dy = -abs(ball.dy)  # Always bounce up
+                ball.y = PADDLE_Y - BALL_SIZE  # Place ball on top of paddle
+
+                # Add spin based on where ball hits paddle
+                hit_pos = (ball.x + BALL_SIZE/2 - self.paddle_x) / self.paddle_width
+                ball.dx = int((hit_pos - 0.5) * 6)  # -3 to +3
+                break  # New velocity applies from the next update
+
+            # Ball collision with bricks, only one per update
+            if self.hit_brick(ball):
+                break
+
+        if ball.y >= SCREEN_HEIGHT:
+            ball.active = False
+
+    def hit_brick(self, ball):
+        """
+        Test the ball against the bricks in the grid cells it overlaps.
+        On a hit, remove the brick and bounce off the side with the
+        shallower overlap. Returns True if a brick was hit.
+        """
+        bx0 = ball.x
+        by0 = ball.y
+        bx1 = bx0 + BALL_SIZE
+        by1 = by0 + BALL_SIZE
+        row0 = max(0, int(by0 - BRICK_OFFSET_TOP) // BRICK_PITCH_Y)
+        row1 = min(BRICK_ROWS - 1, int(by1 - BRICK_OFFSET_TOP) // BRICK_PITCH_Y)
+        col0 = max(0, int(bx0 - BRICK_OFFSET_LEFT) // BRICK_PITCH_X)
+        col1 = min(BRICK_COLS - 1, int(bx1 - BRICK_OFFSET_LEFT) // BRICK_PITCH_X)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                i = row * BRICK_COLS + col
+                brick = self.grid[i]
+                if not brick:
+                    continue
+                x, y = brick_rect(row, col)
+                if bx1 >= x and bx0 <= x + BRICK_WIDTH and by1 >= y and by0 <= y + BRICK_HEIGHT:
+                    # Deactivate brick
+                    self.grid[i] = 0
+                    self.active_bricks -= 1
+                    self.score += 10
+                    if brick & POWER_BRICK:
+                        self.spawn_drop(x + (BRICK_WIDTH - DROP_WIDTH) // 2, y,
+                                        random.randint(0, len(POWER_LABELS) - 1))
+
+                    # Only this brick's rectangle needs clearing
+                    self.erase_queue.append(i)
+
+                    # Bounce off the face the ball went in through
+                    overlap_x = min(bx1 - x, x + BRICK_WIDTH - bx0)
+                    overlap_y = min(by1 - y, y + BRICK_HEIGHT - by0)
+                    if overlap_x < overlap_y:
+                        ball.dx = -ball.dx
+                    else:
+                        ball.dy = -ball.dy
+                    return True
+        return False
+
+    def move_drops(self):
+        """Let power-ups fall, applying any the paddle catches."""
+        for drop in self.drops:
+            if not drop.active:
                 continue
-
-            bx, by, color, active = brick
-
-            # Simple AABB collision
-            if (self.ball_x + BALL_SIZE >= bx and
-                self.ball_x <= bx + BRICK_WIDTH and
-                self.ball_y + BALL_SIZE >= by and
-                self.ball_y <= by + BRICK_HEIGHT):
-
-                # Deactivate brick
-                brick[3] = False
-                self.score += 10
-
-                # Mark that brick needs to be erased
-                self.needs_full_redraw = True
-
-                # Bounce ball
-                self.ball_dy = -self.ball_dy
-
-                break  # Only hit one brick per frame
-
-        # Check win condition
-        active_bricks = sum(1 for b in self.bricks if b[3])
-        if active_bricks == 0:
-            self.won = True
-
-    def draw(self):
-        """Draw everything with partial updates to reduce flicker"""
-
-        # Full redraw needed for bricks being destroyed or game state changes
+            drop.y += DROP_SPEED
+            if (drop.y + DROP_HEIGHT >= PADDLE_Y and
+                drop.y < PADDLE_Y + PADDLE_HEIGHT and
+                drop.x + DROP_WIDTH >= self.paddle_x and
+                drop.x <= self.paddle_x + self.paddle_width):
+                drop.active = False
+                self.apply_power(drop.kind)
+            elif drop.y >= SCREEN_HEIGHT:
+                drop.active = False
+
+    def apply_power(self, kind):
+        if kind == POWER_MULTI:
+            # Two more balls from the first one in play
+            for ball in self.balls:
+                if ball.active:
+                    self.spawn_ball(ball.x, ball.y, -ball.dx or BALL_SPEED_X, ball.dy)
+                    self.spawn_ball(ball.x, ball.y, ball.dx, -ball.dy)
+                    break
+        elif kind == POWER_WIDE:
+            self.set_paddle_width(WIDE_PADDLE_WIDTH)
+            self.wide_ticks = WIDE_TICKS
+        elif kind == POWER_LIFE:
+            self.lives += 1
+
+    def record_level_time(self):
+        """Add the frame timing of the level just played to level_times."""
+        loop = self.loop
+        if loop is None:
+            return
+        avg = loop.total_frame_ms / loop.frames if loop.frames else 0
+        self.level_times.append("L%d %.1fms avg %dms max %d skip" % (
+            self.level + 1, avg, loop.max_frame_ms, loop.skipped))
+        loop.reset_stats()
+
+    def draw(self, alpha=0):
+        """
+        Draw everything with partial updates to reduce flicker.
+        alpha is how far (0..1) we are into the next update; balls and
+        drops are drawn that far along their movement.
+        """
+        # Full redraw needed for game state changes
         if self.needs_full_redraw:
             # Clear screen
             fb.fill(COLOR_BLACK)
 
             # Draw all bricks
-            for brick in self.bricks:
-                if brick[3]:  # Only draw active bricks
-                    fb.fill_rect(brick[0], brick[1], BRICK_WIDTH, BRICK_HEIGHT, brick[2])
+            for i in range(BRICK_ROWS * BRICK_COLS):
+                if self.grid[i]:
+                    self.draw_brick(i)
 
-            # Draw score and lives
+            # Draw score, level and lives
             fb.text(f"Score:{self.score}", 8, 8, COLOR_WHITE)
+            fb.text(f"Level {self.level + 1}", 128, 8, COLOR_CYAN)
             fb.text(f"Lives:{self.lives}", SCREEN_WIDTH - 80, 8, COLOR_WHITE)
 
             self.needs_full_redraw = False
+            self.erase_queue = []
         else:
             # Partial update - only redraw moving elements
 
             # Erase previous paddle position if it moved
-            if self.prev_paddle_x != self.paddle_x:
-                fb.fill_rect(int(self.prev_paddle_x), PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT, COLOR_BLACK)
-
-            # Erase previous ball position
-            fb.fill_rect(int(self.prev_ball_x), int(self.prev_ball_y), BALL_SIZE, BALL_SIZE, COLOR_BLACK)
+            if self.prev_paddle_x != self.paddle_x or self.prev_paddle_width != self.paddle_width:
+                fb.fill_rect(int(self.prev_paddle_x), PADDLE_Y, self.prev_paddle_width, PADDLE_HEIGHT, COLOR_BLACK)
+
+            # Erase bricks destroyed since the last frame
+            for i in self.erase_queue:
+                x, y = brick_rect(i // BRICK_COLS, i % BRICK_COLS)
+                fb.fill_rect(x, y, BRICK_WIDTH, BRICK_HEIGHT, COLOR_BLACK)
+            self.erase_queue = []
+
+            # Erase previous ball and drop positions, restoring any brick
+            # they overlapped
+            for ball in self.balls:
+                if ball.drawn_x >= 0:
+                    fb.fill_rect(ball.drawn_x, ball.drawn_y, BALL_SIZE, BALL_SIZE, COLOR_BLACK)
+                    self.repaint_bricks(ball.drawn_x, ball.drawn_y, BALL_SIZE, BALL_SIZE)
+            for drop in self.drops:
+                if drop.drawn_x >= 0:
+                    fb.fill_rect(drop.drawn_x, drop.drawn_y, DROP_WIDTH, DROP_HEIGHT, COLOR_BLACK)
+                    self.repaint_bricks(drop.drawn_x, drop.drawn_y, DROP_WIDTH, DROP_HEIGHT)
 
             # Update score if changed
             if self.prev_score != self.score:
@@ -207,24 +485,68 @@ class Game:
                 self.prev_lives = self.lives
 
         # Draw paddle at new position
-        fb.fill_rect(int(self.paddle_x), PADDLE_Y, PADDLE_WIDTH, PADDLE_HEIGHT, COLOR_WHITE)
-
-        # Draw ball at new position
-        fb.fill_rect(int(self.ball_x), int(self.ball_y), BALL_SIZE, BALL_SIZE, COLOR_WHITE)
+        fb.fill_rect(int(self.paddle_x), PADDLE_Y, self.paddle_width, PADDLE_HEIGHT, COLOR_WHITE)
+
+        # Draw balls and drops at new positions
+        for ball in self.balls:
+            if ball.active:
+                x = int(max(0, min(SCREEN_WIDTH - BALL_SIZE, ball.x + ball.dx * alpha)))
+                y = int(ball.y + ball.dy * alpha)
+                fb.fill_rect(x, y, BALL_SIZE, BALL_SIZE, COLOR_WHITE)
+                ball.drawn_x = x
+                ball.drawn_y = y
+            else:
+                ball.drawn_x = -1
+        for drop in self.drops:
+            if drop.active:
+                y = int(drop.y + DROP_SPEED * alpha)
+                fb.fill_rect(drop.x, y, DROP_WIDTH, DROP_HEIGHT, POWER_COLORS[drop.kind])
+                fb.text(POWER_LABELS[drop.kind], drop.x + 4, y, COLOR_BLACK)
+                drop.drawn_x = drop.x
+                drop.drawn_y = y
+            else:
+                drop.drawn_x = -1
 
         # Store positions for next frame
         self.prev_paddle_x = self.paddle_x
-        self.prev_ball_x = self.ball_x
-        self.prev_ball_y = self.ball_y
+        self.prev_paddle_width = self.paddle_width
 
         # Draw game over / win message
         if self.game_over:
             self.draw_centered_text("GAME OVER", 140, COLOR_RED)
             self.draw_centered_text("Press Q to quit", 160, COLOR_WHITE)
+            self.draw_level_times(190)
         elif self.won:
             self.draw_centered_text("YOU WIN!", 140, COLOR_GREEN)
             self.draw_centered_text(f"Score: {self.score}", 160, COLOR_YELLOW)
             self.draw_centered_text("Press Q to quit", 180, COLOR_WHITE)
+            self.draw_level_times(210)
+
+    def draw_level_times(self, y):
+        """List the frame timing of the last few levels played."""
+        for line in self.level_times[-6:]:
+            self.draw_centered_text(line, y, COLOR_CYAN)
+            y += 12
+
+    def draw_brick(self, i):
+        """Draw the brick at grid index i; power-up bricks get an inner outline."""
+        x, y = brick_rect(i // BRICK_COLS, i % BRICK_COLS)
+        brick = self.grid[i]
+        fb.fill_rect(x, y, BRICK_WIDTH, BRICK_HEIGHT, brick & BRICK_COLOR_MASK)
+        if brick & POWER_BRICK:
+            fb.rect(x + 2, y + 2, BRICK_WIDTH - 4, BRICK_HEIGHT - 4, COLOR_BLACK)
+
+    def repaint_bricks(self, x0, y0, w, h):
+        """Redraw the active bricks touching the given rectangle."""
+        row0 = max(0, (y0 - BRICK_OFFSET_TOP) // BRICK_PITCH_Y)
+        row1 = min(BRICK_ROWS - 1, (y0 + h - BRICK_OFFSET_TOP) // BRICK_PITCH_Y)
+        col0 = max(0, (x0 - BRICK_OFFSET_LEFT) // BRICK_PITCH_X)
+        col1 = min(BRICK_COLS - 1, (x0 + w - BRICK_OFFSET_LEFT) // BRICK_PITCH_X)
+        for row in range(row0, row1 + 1):
+            for col in range(col0, col1 + 1):
+                i = row * BRICK_COLS + col
+                if self.grid[i]:
+                    self.draw_brick(i)
 
     def draw_centered_text(self, text, y, color):
         """Draw text centered on screen"""
@@ -233,7 +555,8 @@ class Game:
 
 def main():
     """Main game loop"""
-    game = Game()
+    loop = GameLoop(1000 // 30)
+    game = Game(loop)
 
     # Title screen
     fb.fill(COLOR_BLACK)
@@ -246,27 +569,12 @@ def main():
     while not keyboard.readinto(temp):
         pass
 
-    # Game loop
-    last_time = time.ticks_ms()
-    frame_time = 1000 // 30  # 30 FPS
-
-    while game.running:
-        current_time = time.ticks_ms()
-
-        # Check input
+    # Game loop: physics at a fixed 30 updates per second
+    def poll():
         game.check_input()
+        return game.running
 
-        # Update game state
-        game.update()
-
-        # Draw everything
-        game.draw()
-
-        # Frame timing
-        elapsed = time.ticks_diff(current_time, last_time)
-        if elapsed < frame_time:
-            time.sleep_ms(frame_time - elapsed)
-        last_time = current_time
+    loop.run(game.update, game.draw, poll)
 
     # Goodbye screen
     fb.fill(COLOR_BLACK)
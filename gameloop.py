@@ -0,0 +1,109 @@
+# gameloop.py - Fixed-timestep game loop shared by the PicoCalc games
+# MicroPython
+import time
+
+class GameLoop:
+    """
+    Run game logic at a fixed rate, independent of how long drawing takes.
+
+    Elapsed time is added to an accumulator and paid out in step_ms
+    updates, so a slow frame is followed by extra updates instead of the
+    game slowing down. When more than max_updates are owed in one frame
+    the backlog is dropped (frame skipping) rather than letting the game
+    spiral. render(alpha) receives the fraction of a step left in the
+    accumulator, for drawing moving objects between updates.
+
+    Usage:
+        loop = GameLoop(33)
+        loop.run(game.update, game.draw, game.handle_input)
+
+    update() and poll() may return False to stop the loop.
+    """
+    def __init__(self, step_ms, max_updates=5):
+        self.step_ms = step_ms      # May be changed while running
+        self.max_updates = max_updates
+        self.running = False
+        self._resync = False
+        # Timing stats
+        self.reset_stats()
+        self.fps = 0                # Frames rendered in the last second
+        self._fps_frames = 0
+        self._fps_start = 0
+
+    def stop(self):
+        self.running = False
+
+    def reset_stats(self):
+        """Zero the timing stats, e.g. at the start of a level."""
+        self.frames = 0
+        self.updates = 0
+        self.skipped = 0            # Updates dropped to catch up
+        self.frame_ms = 0           # Work time of the last frame
+        self.max_frame_ms = 0
+        self.total_frame_ms = 0
+
+    def resync(self):
+        """Forget time spent away from the loop, e.g. in a pause screen."""
+        self._resync = True
+
+    def run(self, update, render=None, poll=None):
+        self.running = True
+        last = time.ticks_ms()
+        self._fps_start = last
+        acc = 0
+        while self.running:
+            start = time.ticks_ms()
+            if self._resync:
+                last = start
+                acc = 0
+                self._resync = False
+            acc += time.ticks_diff(start, last)
+            last = start
+
+            if poll is not None and poll() is False:
+                break
+            if self._resync:  # poll() blocked, e.g. a pause
+                continue
+
+            n = 0
+            while acc >= self.step_ms and self.running:
+                if n == self.max_updates:
+                    dropped = acc // self.step_ms
+                    self.skipped += dropped
+                    acc -= dropped * self.step_ms
+                    break
+                if update() is False:
+                    self.running = False
+                acc -= self.step_ms
+                n += 1
+            self.updates += n
+
+            if render is not None and self.running:
+                render(acc / self.step_ms)
+
+            end = time.ticks_ms()
+            self._count_frame(start, end)
+            # Sleep until the next update is due
+            wait = self.step_ms - acc - time.ticks_diff(end, last)
+            if wait > 0:
+                time.sleep_ms(wait)
+        self.running = False
+
+    def _count_frame(self, start, end):
+        ms = time.ticks_diff(end, start)
+        self.frame_ms = ms
+        self.total_frame_ms += ms
+        if ms > self.max_frame_ms:
+            self.max_frame_ms = ms
+        self.frames += 1
+        self._fps_frames += 1
+        if time.ticks_diff(end, self._fps_start) >= 1000:
+            self.fps = self._fps_frames
+            self._fps_frames = 0
+            self._fps_start = end
+
+    def stats(self):
+        """One-line timing summary."""
+        avg = self.total_frame_ms / self.frames if self.frames else 0
+        return "fps %d  frame avg %.1f ms max %d ms  updates %d  skipped %d" % (
+            self.fps, avg, self.max_frame_ms, self.updates, self.skipped)
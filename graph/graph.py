@@ -1,10 +1,11 @@
 # graph.py - Simple Graphing Calculator for PicoCalc
-# Enter y=f(x) at the bottom, graph is drawn above
+# Enter y1..y4 = f(x) at the bottom, graphs are drawn above
+# M cycles normal, parametric, polar and implicit f(x,y)=0 modes
 import time
 import picocalc
 from picocalc import keyboard
 import math
-
+from array import array
 # Display setup
 fb = picocalc.display
 SCREEN_WIDTH = 320
@@ -18,6 +19,25 @@ COLOR_GRAPH = 3
 COLOR_TEXT = 7
 COLOR_ERROR = 2
 
+# Palette colors for y1..y4
+FUNC_COLORS = (3, 4, 5, 6)
+NUM_FUNCS = len(FUNC_COLORS)
+NO_POINT = -1  # Cached row value for columns with nothing to plot
+
+# Incremental plotting: work per frame before showing it and checking keys,
+# and the column stride of the first (coarse) pass
+FRAME_BUDGET_MS = 30
+COARSE_STEP = 8
+
+# Table of values layout, and rows buffered per write when exporting CSV
+TABLE_TOP = 44
+TABLE_ROW_H = 12
+TABLE_ROWS = 20
+CSV_FLUSH_ROWS = 32
+
+# Most PicoCalc firmware builds use single-precision floats
+FLOAT_EPS = 1.2e-7
+
 # Graph area: x in [-10, 10], y in [-10, 10] (default)
 XMIN, XMAX = -10, 10
 YMIN, YMAX = -10, 10
@@ -25,6 +45,18 @@ YMIN, YMAX = -10, 10
 # Parametric mode t range
 TMIN, TMAX = -10, 10
 
+# Polar mode theta range and sample count
+THETA_MIN, THETA_MAX = 0, 2 * math.pi
+POLAR_STEPS = 720
+
+# Implicit mode: coarse marching-squares cell and the size refinement stops at
+IMPLICIT_CELL = 8
+IMPLICIT_MIN_CELL = 2
+
+MODES = ('normal', 'param', 'polar', 'implicit')
+MODE_PREFIX = {'polar': 'r(t)=', 'implicit': 'f(x,y): '}
+MODE_DEFAULTS = {'polar': "8*cos(3*t)", 'implicit': "x**3 + y**3 = 9*x*y"}
+
  # Map x in [-10,10] to pixel in [0,319]
 def x_to_px(x):
     return int((x - XMIN) / (XMAX - XMIN) * (SCREEN_WIDTH - 1))
@@ -39,6 +71,373 @@ def y_to_py(y):
 def py_to_y(py):
     return YMAX - py * (YMAX - YMIN) / (GRAPH_HEIGHT - 1)
 
+# Names available inside expressions. Built once and copied per evaluator
+# rather than rebuilt for every sample.
+EVAL_NAMES = {
+    'abs': abs, 'min': min, 'max': max, 'pow': pow, 'round': round,
+    'int': int, 'float': float, 'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'asin': math.asin, 'acos': math.acos, 'atan': math.atan, 'atan2': math.atan2,
+    'log': math.log, 'log10': math.log10, 'exp': math.exp, 'sqrt': math.sqrt,
+    'pi': math.pi, 'e': math.e, 'floor': math.floor, 'ceil': math.ceil,
+    'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh,
+    'degrees': math.degrees, 'radians': math.radians,
+    'math': math,
+}
+
+def compile_expr(expr, var='x'):
+    """
+    Compile expr once and return an evaluator f(v).
+
+    f(v) returns a finite number, or None where the expression is undefined.
+    Raises on syntax errors so callers can report them.
+    """
+    code = compile(expr, '<expr>', 'eval')
+    env = dict(EVAL_NAMES)
+
+    def f(v):
+        env[var] = v
+        try:
+            y = eval(code, env)
+        except Exception:
+            return None
+        if not isinstance(y, (int, float)) or math.isnan(y) or math.isinf(y):
+            return None
+        return y
+    return f
+
+def implicit_form(expr):
+    """Rewrite 'lhs = rhs' as '(lhs)-(rhs)' so the curve is f(x, y) = 0."""
+    for i in range(len(expr)):
+        if (expr[i] == '=' and expr[i - 1:i] not in ('<', '>', '!', '=')
+                and expr[i + 1:i + 2] != '='):
+            return '(' + expr[:i] + ')-(' + expr[i + 1:] + ')'
+    return expr
+
+def compile_implicit(expr):
+    """Like compile_expr, but the evaluator takes f(x, y)."""
+    code = compile(implicit_form(expr), '<expr>', 'eval')
+    env = dict(EVAL_NAMES)
+
+    def f(x, y):
+        env['x'] = x
+        env['y'] = y
+        try:
+            v = eval(code, env)
+        except Exception:
+            return None
+        if not isinstance(v, (int, float)) or math.isnan(v) or math.isinf(v):
+            return None
+        return v
+    return f
+
+class PlotFunc:
+    """
+    One y=f(x) slot with a cache of its sampled values.
+
+    The cache is keyed by the expression text and the viewport, so a slot
+    is only re-evaluated when its own expression or the window changes.
+    """
+    def __init__(self, name, color, expr=''):
+        self.name = name
+        self.color = color
+        self.expr = expr
+        self.error = None
+        self.key = None
+        self.fn = None                                      # compiled evaluator
+        self.ys = [None] * SCREEN_WIDTH                     # f(x) per column
+        self.rows = array('h', [NO_POINT] * SCREEN_WIDTH)  # pixel row per column
+
+    def cache_key(self):
+        return (self.expr, XMIN, XMAX, YMIN, YMAX)
+
+    def is_cached(self):
+        return self.key == self.cache_key()
+
+    def draw_cached(self):
+        """Plot straight from the cached pixel rows."""
+        rows = self.rows
+        color = self.color
+        for px in range(SCREEN_WIDTH):
+            py = rows[px]
+            if py != NO_POINT:
+                fb.pixel(px, py, color)
+
+def find_root(f, a, b, ya, yb, tol, maxiter=60):
+    """
+    Brent's method on a sign-change bracket [a, b].
+
+    ya and yb are the already-sampled values at the ends, so only the
+    interior refinement steps call f. Returns None if f becomes undefined.
+    """
+    if ya == 0:
+        return a
+    if yb == 0:
+        return b
+    if ya * yb > 0:
+        return None
+    c, yc = a, ya
+    d = e = b - a
+    for _ in range(maxiter):
+        if yb * yc > 0:
+            c, yc = a, ya
+            d = e = b - a
+        if abs(yc) < abs(yb):
+            a, b, c = b, c, b
+            ya, yb, yc = yb, yc, yb
+        tol1 = 2 * FLOAT_EPS * abs(b) + 0.5 * tol
+        xm = 0.5 * (c - b)
+        if abs(xm) <= tol1 or yb == 0:
+            return b
+        if abs(e) >= tol1 and abs(ya) > abs(yb):
+            # Secant or inverse quadratic step
+            s = yb / ya
+            if a == c:
+                p = 2 * xm * s
+                q = 1 - s
+            else:
+                q = ya / yc
+                r = yb / yc
+                p = s * (2 * xm * q * (q - r) - (b - a) * (r - 1))
+                q = (q - 1) * (r - 1) * (s - 1)
+            if p > 0:
+                q = -q
+            p = abs(p)
+            if 2 * p < min(3 * xm * q - abs(tol1 * q), abs(e * q)):
+                e = d
+                d = p / q
+            else:
+                d = e = xm
+        else:
+            d = e = xm
+        a, ya = b, yb
+        b += d if abs(d) > tol1 else (tol1 if xm > 0 else -tol1)
+        yb = f(b)
+        if yb is None:
+            return None
+    return b
+
+def find_min(f, a, b, x, ya, yb, yx, tol, maxiter=60):
+    """
+    Brent's minimiser on a bracket a < x < b with f(x) below both ends.
+
+    The two bracket ends seed the parabola, so the first step already
+    interpolates through three sampled points. Returns (x, f(x)).
+    """
+    cgold = 0.381966
+    w, yw = a, ya
+    v, yv = b, yb
+    d = 0.0
+    e = b - a
+    for _ in range(maxiter):
+        xm = 0.5 * (a + b)
+        tol1 = FLOAT_EPS * abs(x) + tol
+        tol2 = 2 * tol1
+        if abs(x - xm) <= tol2 - 0.5 * (b - a):
+            break
+        golden = True
+        if abs(e) > tol1:
+            r = (x - w) * (yx - yv)
+            q = (x - v) * (yx - yw)
+            p = (x - v) * q - (x - w) * r
+            q = 2 * (q - r)
+            if q > 0:
+                p = -p
+            q = abs(q)
+            etemp = e
+            e = d
+            if not (abs(p) >= abs(0.5 * q * etemp) or p <= q * (a - x) or p >= q * (b - x)):
+                # Parabolic step
+                golden = False
+                d = p / q
+                u = x + d
+                if u - a < tol2 or b - u < tol2:
+                    d = tol1 if xm >= x else -tol1
+        if golden:
+            e = (a - x) if x >= xm else (b - x)
+            d = cgold * e
+        u = x + d if abs(d) >= tol1 else x + (tol1 if d >= 0 else -tol1)
+        yu = f(u)
+        if yu is None:
+            break
+        if yu <= yx:
+            if u >= x:
+                a = x
+            else:
+                b = x
+            v, w, x = w, x, u
+            yv, yw, yx = yw, yx, yu
+        else:
+            if u < x:
+                a = u
+            else:
+                b = u
+            if yu <= yw or w == x:
+                v, w = w, u
+                yv, yw = yw, yu
+            elif yu <= yv or v == x or v == w:
+                v, yv = u, yu
+    return x, yx
+
+def integrate(f, a, b, ya, ym, yb, eps, max_depth=12):
+    """
+    Adaptive Simpson's rule on [a, b] given f at both ends and the middle.
+
+    Uses an explicit stack rather than recursion to stay clear of
+    MicroPython's small recursion limit. Returns None if f is undefined
+    anywhere it is sampled.
+    """
+    total = 0.0
+    whole = (b - a) / 6 * (ya + 4 * ym + yb)
+    stack = [(a, b, ya, ym, yb, whole, eps, max_depth)]
+    while stack:
+        a, b, ya, ym, yb, whole, eps, depth = stack.pop()
+        m = (a + b) / 2
+        ylm = f((a + m) / 2)
+        yrm = f((m + b) / 2)
+        if ylm is None or yrm is None:
+            return None
+        left = (m - a) / 6 * (ya + 4 * ylm + ym)
+        right = (b - m) / 6 * (ym + 4 * yrm + yb)
+        delta = left + right - whole
+        if depth <= 0 or abs(delta) <= 15 * eps:
+            total += left + right + delta / 15
+        else:
+            stack.append((a, m, ya, ylm, ym, left, eps / 2, depth - 1))
+            stack.append((m, b, ym, yrm, yb, right, eps / 2, depth - 1))
+    return total
+
+def _negate(f):
+    def g(x):
+        y = f(x)
+        return None if y is None else -y
+    return g
+
+def _difference(f, g):
+    def h(x):
+        a = f(x)
+        if a is None:
+            return None
+        b = g(x)
+        return None if b is None else a - b
+    return h
+
+def _column_lookup(func):
+    """Evaluator that answers from the sample cache when x lands on a column."""
+    ys = func.ys
+    fn = func.fn
+    scale = (SCREEN_WIDTH - 1) / (XMAX - XMIN)
+
+    def f(x):
+        c = (x - XMIN) * scale
+        px = int(c + 0.5)
+        if 0 <= px < SCREEN_WIDTH and abs(c - px) < 1e-3 and ys[px] is not None:
+            return ys[px]
+        return fn(x)
+    return f
+
+def _sign_changes(ys):
+    """Yield (px, y0, y1) for neighbouring samples that bracket a zero."""
+    for px in range(SCREEN_WIDTH - 1):
+        y0 = ys[px]
+        y1 = ys[px + 1]
+        if y0 is None or y1 is None:
+            continue
+        if y0 == 0 or y0 * y1 < 0:
+            yield px, y0, y1
+
+def _x_tol():
+    return (XMAX - XMIN) * 1e-6
+
+def find_roots(func):
+    """All roots of func in the window, as (x, 0) points."""
+    roots = []
+    for px, y0, y1 in _sign_changes(func.ys):
+        r = find_root(func.fn, px_to_x(px), px_to_x(px + 1), y0, y1, _x_tol())
+        if r is None:
+            continue
+        # A sign change across a pole (e.g. tan) converges on the pole
+        yr = func.fn(r)
+        if yr is not None and abs(yr) <= min(abs(y0), abs(y1)):
+            roots.append((r, 0))
+    return roots
+
+def find_intersections(func, other):
+    """All points where func and other cross within the window."""
+    diff = [None] * SCREEN_WIDTH
+    for px in range(SCREEN_WIDTH):
+        a = func.ys[px]
+        b = other.ys[px]
+        if a is not None and b is not None:
+            diff[px] = a - b
+    h = _difference(func.fn, other.fn)
+    points = []
+    for px, d0, d1 in _sign_changes(diff):
+        r = find_root(h, px_to_x(px), px_to_x(px + 1), d0, d1, _x_tol())
+        if r is None:
+            continue
+        dr = h(r)
+        y = func.fn(r)
+        if dr is not None and y is not None and abs(dr) <= min(abs(d0), abs(d1)):
+            points.append((r, y))
+    return points
+
+def find_extrema(func, maximum=False):
+    """Local minima (or maxima) of func in the window, as (x, y) points."""
+    ys = func.ys
+    f = _negate(func.fn) if maximum else func.fn
+    sign = -1 if maximum else 1
+    points = []
+    for px in range(1, SCREEN_WIDTH - 1):
+        ya = ys[px - 1]
+        yx = ys[px]
+        yb = ys[px + 1]
+        if ya is None or yx is None or yb is None:
+            continue
+        ya, yx, yb = sign * ya, sign * yx, sign * yb
+        if yx < ya and yx <= yb:
+            x, y = find_min(f, px_to_x(px - 1), px_to_x(px + 1), px_to_x(px),
+                            ya, yb, yx, _x_tol())
+            points.append((x, sign * y))
+    return points
+
+def integrate_columns(func, px_a, px_b):
+    """
+    Definite integral of func between two screen columns.
+
+    Starts from 8-column Simpson panels whose nodes all come from the
+    sample cache, so only panels that need refinement cost evaluations.
+    """
+    sign = 1
+    if px_b < px_a:
+        px_a, px_b = px_b, px_a
+        sign = -1
+    if px_a == px_b:
+        return 0.0
+    ys = func.ys
+    f = _column_lookup(func)
+    scale = 1.0
+    for y in ys:
+        if y is not None and abs(y) > scale:
+            scale = abs(y)
+    eps = 1e-5 * scale * (XMAX - XMIN)
+    panels = (px_b - px_a + 7) // 8
+    total = 0.0
+    for i in range(panels):
+        pa = px_a + (px_b - px_a) * i // panels
+        pb = px_a + (px_b - px_a) * (i + 1) // panels
+        a = px_to_x(pa)
+        b = px_to_x(pb)
+        ya = f(a)
+        ym = f((a + b) / 2)
+        yb = f(b)
+        if ya is None or ym is None or yb is None:
+            return None
+        part = integrate(f, a, b, ya, ym, yb, eps / panels)
+        if part is None:
+            return None
+        total += part
+    return sign * total
+
 def draw_axes():
     # Draw axes
     # Y axis
@@ -51,123 +450,563 @@ def draw_axes():
     # Draw border
     fb.rect(0, 0, SCREEN_WIDTH, GRAPH_HEIGHT, COLOR_AXES)
 
-def draw_input_line(expr, error=None, mode='normal', expr2=None):
+def draw_input_line(expr, error=None, mode='normal', expr2=None, funcs=None, active=0):
     # Clear input area
     fb.fill_rect(0, GRAPH_HEIGHT, SCREEN_WIDTH, INPUT_HEIGHT, COLOR_BG)
     if mode == 'param':
         fb.text('x(t)=' + (expr or ''), 4, GRAPH_HEIGHT + 4, COLOR_TEXT)
         if expr2 is not None:
             fb.text('y(t)=' + expr2, 4, GRAPH_HEIGHT + 16, COLOR_TEXT)
+    elif mode in MODE_PREFIX:
+        fb.text(MODE_PREFIX[mode] + expr, 4, GRAPH_HEIGHT + 4, COLOR_TEXT)
+    elif funcs:
+        func = funcs[active]
+        fb.text(func.name + '= ' + expr, 4, GRAPH_HEIGHT + 4, func.color)
+        # Slot strip: enabled slots in their color, active one underlined
+        for i, f in enumerate(funcs):
+            lx = 4 + i * 40
+            fb.text(f.name, lx, GRAPH_HEIGHT + 20, f.color if f.expr else COLOR_AXES)
+            if i == active:
+                fb.fill_rect(lx, GRAPH_HEIGHT + 30, 16, 1, COLOR_TEXT)
+        if error is None:
+            error = func.error
     else:
         fb.text('y = ' + expr, 4, GRAPH_HEIGHT + 4, COLOR_TEXT)
     if error:
         fb.text(error, 200, GRAPH_HEIGHT + 4, COLOR_ERROR)
 
-def graph_equation(expr):
-    fb.fill(COLOR_BG)
-    draw_axes()
-    # Try to compile the expression
+def refine_order(n, coarse=COARSE_STEP):
+    """
+    Yield 0..n-1 coarse to fine: every coarse-th index first, then the
+    midpoints of each remaining gap, so the whole curve appears early
+    and sharpens as later passes fill in.
+    """
+    step = coarse
+    for i in range(0, n, step):
+        yield i
+    while step > 1:
+        half = step // 2
+        for i in range(half, n, step):
+            yield i
+        step = half
+
+def plot_steps(func, budget_ms=FRAME_BUDGET_MS):
+    """
+    Generator that evaluates func across the screen, filling its cache.
+
+    Yields whenever budget_ms of work has been done so the caller can
+    show the frame and poll input. The cache only becomes valid once
+    every column is done.
+    """
+    func.key = None
+    func.error = None
+    func.fn = None
+    for px in range(SCREEN_WIDTH):
+        func.ys[px] = None
+        func.rows[px] = NO_POINT
+    if not func.expr:
+        return
     try:
-        code = compile(expr, '<expr>', 'eval')
-    except Exception as e:
-        draw_input_line(expr, 'Syntax Error')
+        f = compile_expr(func.expr)
+    except Exception:
+        func.error = 'Syntax Error'
+        return
+    func.fn = f
+    ys = func.ys
+    rows = func.rows
+    color = func.color
+    start = time.ticks_ms()
+    for px in refine_order(SCREEN_WIDTH):
+        y = f(px_to_x(px))
+        if y is not None:
+            ys[px] = y
+            py = y_to_py(y)
+            if 0 <= py < GRAPH_HEIGHT:
+                rows[px] = py
+                fb.pixel(px, py, color)
+        if time.ticks_diff(time.ticks_ms(), start) >= budget_ms:
+            yield
+            start = time.ticks_ms()
+    func.key = func.cache_key()
+
+def run_steps(steps):
+    """
+    Drive a plotting generator, showing a frame after each step.
+
+    Returns False if a key press cancelled it; the rest of the key
+    (e.g. an arrow sequence) is drained so it isn't typed into the editor.
+    """
+    temp = bytearray(1)
+    for _ in steps:
         fb.show()
+        if keyboard.readinto(temp):
+            while keyboard.readinto(temp):
+                pass
+            return False
+    fb.show()
+    return True
+
+def draw_cached(funcs):
+    """Redraw every slot that has a valid cache, without evaluating."""
+    for func in funcs:
+        if func.expr and func.is_cached():
+            func.draw_cached()
+
+def graph_functions(funcs, active=0):
+    """
+    Draw all slots, re-evaluating only those whose cache is stale.
+
+    Returns False if the user pressed a key to cancel plotting.
+    """
+    fb.fill(COLOR_BG)
+    draw_axes()
+    draw_cached(funcs)
+    fb.show()
+    for func in funcs:
+        if func.expr and not func.is_cached():
+            if not run_steps(plot_steps(func)):
+                return False
+    func = funcs[active]
+    if func.error:
+        draw_input_line(func.expr, funcs=funcs, active=active)
+    fb.show()
+    return True
+
+def fmt(v):
+    return '%.4g' % v
+
+def draw_marks(points):
+    """Mark analysis results with small boxes."""
+    for x, y in points:
+        px = x_to_px(x)
+        py = y_to_py(y)
+        if 0 <= px < SCREEN_WIDTH and 0 <= py < GRAPH_HEIGHT:
+            fb.rect(px - 2, py - 2, 5, 5, COLOR_TEXT)
+
+def shade_area(func, px_a, px_b):
+    """Fill between func and the x axis over a column range."""
+    if px_b < px_a:
+        px_a, px_b = px_b, px_a
+    y0 = min(max(y_to_py(0), 0), GRAPH_HEIGHT - 1)
+    for px in range(max(px_a, 0), min(px_b, SCREEN_WIDTH - 1) + 1):
+        py = func.rows[px]
+        if py != NO_POINT:
+            fb.fill_rect(px, min(py, y0), 1, abs(py - y0) + 1, COLOR_AXES)
+
+def draw_view(funcs, func, trace_px, marks, info, shade=None):
+    fb.fill(COLOR_BG)
+    draw_axes()
+    if shade is not None:
+        shade_area(func, shade[0], shade[1])
+    fb.fill_rect(trace_px, 0, 1, GRAPH_HEIGHT, COLOR_AXES)
+    draw_cached(funcs)
+    draw_marks(marks)
+    fb.fill_rect(0, GRAPH_HEIGHT, SCREEN_WIDTH, INPUT_HEIGHT, COLOR_BG)
+    y = func.ys[trace_px]
+    if y is not None:
+        py = func.rows[trace_px]
+        if py != NO_POINT:
+            fb.fill_rect(trace_px - 1, py - 1, 3, 3, COLOR_TEXT)
+        trace = '%s x=%s y=%s' % (func.name, fmt(px_to_x(trace_px)), fmt(y))
+    else:
+        trace = '%s x=%s y=undef' % (func.name, fmt(px_to_x(trace_px)))
+    fb.text(trace, 4, GRAPH_HEIGHT + 4, func.color)
+    if info:
+        fb.text(info[:39], 4, GRAPH_HEIGHT + 16, COLOR_TEXT)
+    fb.text('R:root N:min X:max I:isect S:area T:tbl', 4, GRAPH_HEIGHT + 28, COLOR_AXES)
+    fb.show()
+
+def _list_points(label, points, use_y=False):
+    if not points:
+        return label + ': none'
+    vals = [fmt(p[1] if use_y else p[0]) for p in points]
+    return label + ': ' + ','.join(vals)
+
+def graph_view(funcs, active=0):
+    """
+    Trace and analyse the plotted functions.
+
+    LEFT/RIGHT move the trace cursor, UP/DOWN switch function. R, N, X
+    and I mark roots, minima, maxima and intersections with the next
+    function. S sets the lower bound, a second S integrates to the
+    cursor. T opens a table of values. Any other key returns to the
+    editor.
+    """
+    plotted = [f for f in funcs if f.expr and f.is_cached()]
+    temp = bytearray(1)
+    if not plotted:
+        while not keyboard.readinto(temp):
+            pass
         return
-    # Draw graph pixel by pixel, updating every 100ms
-    points = []
-    for px in range(SCREEN_WIDTH):
-        x = px_to_x(px)
-        try:
-            # Provide a safe eval environment with math functions and common built-ins
-            env = {'x': x}
-            extra = [
-                ('abs', abs), ('min', min), ('max', max), ('pow', pow), ('round', round),
-                ('int', int), ('float', float), ('sin', math.sin), ('cos', math.cos), ('tan', math.tan),
-                ('asin', math.asin), ('acos', math.acos), ('atan', math.atan), ('atan2', math.atan2),
-                ('log', math.log), ('log10', math.log10), ('exp', math.exp), ('sqrt', math.sqrt),
-                ('pi', math.pi), ('e', math.e), ('floor', math.floor), ('ceil', math.ceil),
-                ('sinh', math.sinh), ('cosh', math.cosh), ('tanh', math.tanh),
-                ('degrees', math.degrees), ('radians', math.radians),
-                ('math', math)
-            ]
-            for k, v in extra:
-                env[k] = v
-            y = eval(code, env)
-        except Exception:
+    func = funcs[active] if funcs[active] in plotted else plotted[0]
+    trace_px = SCREEN_WIDTH // 2
+    marks = []
+    info = ''
+    if funcs[active].error:
+        info = funcs[active].name + ': ' + funcs[active].error
+    shade = None
+    area_start = None
+    draw_view(funcs, func, trace_px, marks, info)
+    while True:
+        if not keyboard.readinto(temp):
+            time.sleep_ms(20)
             continue
-        if not isinstance(y, (int, float)) or math.isnan(y) or math.isinf(y):
+        key = temp[0]
+        if key == 27:
+            seq = bytearray(2)
+            if not (keyboard.readinto(seq) and seq[0] == ord('[')):
+                return
+            if seq[1] == ord('C'):
+                trace_px = min(SCREEN_WIDTH - 1, trace_px + 1)
+            elif seq[1] == ord('D'):
+                trace_px = max(0, trace_px - 1)
+            elif seq[1] in (ord('A'), ord('B')):
+                step = -1 if seq[1] == ord('A') else 1
+                func = plotted[(plotted.index(func) + step) % len(plotted)]
+                marks = []
+                info = ''
+                shade = None
+                area_start = None
+            else:
+                return
+        elif key in (ord('r'), ord('R')):
+            marks = find_roots(func)
+            info = _list_points('Roots', marks)
+        elif key in (ord('n'), ord('N')):
+            marks = find_extrema(func)
+            info = _list_points('Min y', marks, True)
+        elif key in (ord('x'), ord('X')):
+            marks = find_extrema(func, maximum=True)
+            info = _list_points('Max y', marks, True)
+        elif key in (ord('i'), ord('I')):
+            if len(plotted) < 2:
+                info = 'Need a second function'
+            else:
+                other = plotted[(plotted.index(func) + 1) % len(plotted)]
+                marks = find_intersections(func, other)
+                info = _list_points(func.name + '=' + other.name + ' x', marks)
+        elif key in (ord('s'), ord('S')):
+            if area_start is None:
+                area_start = trace_px
+                shade = None
+                info = 'From x=%s, S again to integrate' % fmt(px_to_x(trace_px))
+            else:
+                area = integrate_columns(func, area_start, trace_px)
+                shade = (area_start, trace_px)
+                info = 'Area=' + ('undef' if area is None else fmt(area))
+                area_start = None
+        elif key in (ord('t'), ord('T')):
+            table_view(func)
+        else:
+            return
+        draw_view(funcs, func, trace_px, marks, info, shade)
+
+def read_number(prompt, value):
+    """
+    Edit a number on the bottom line. Accepts expressions such as pi/4.
+
+    Returns the new value, or the old one if cancelled or invalid.
+    """
+    buf = list(fmt(value))
+    temp = bytearray(1)
+    while True:
+        fb.fill_rect(0, SCREEN_HEIGHT - 12, SCREEN_WIDTH, 12, COLOR_BG)
+        fb.text(prompt + ''.join(buf), 4, SCREEN_HEIGHT - 10, COLOR_TEXT)
+        fb.fill_rect(4 + 8 * (len(prompt) + len(buf)), SCREEN_HEIGHT - 10, 6, 8, COLOR_TEXT)
+        fb.show()
+        while not keyboard.readinto(temp):
+            time.sleep_ms(20)
+        key = temp[0]
+        if key in (ord('\r'), ord('\n')):
+            try:
+                v = compile_expr(''.join(buf))(0)
+            except Exception:
+                v = None
+            return value if v is None else v
+        elif key == 27:
+            while keyboard.readinto(temp):
+                pass
+            return value
+        elif key in (8, 127):
+            if buf:
+                buf.pop()
+        elif 32 <= key <= 126:
+            buf.append(chr(key))
+
+def table_count(start, end, step):
+    """Number of rows from start to end inclusive."""
+    if step <= 0 or end < start:
+        return 1
+    return int((end - start) / step + 1e-6) + 1
+
+def draw_table(func, start, step, count, top, values):
+    fb.fill(COLOR_BG)
+    fb.text((func.name + '=' + func.expr)[:39], 4, 4, func.color)
+    fb.text('x', 12, 28, COLOR_TEXT)
+    fb.text(func.name, 164, 28, func.color)
+    fb.text('step ' + fmt(step), 232, 28, COLOR_AXES)
+    fb.fill_rect(0, 38, SCREEN_WIDTH, 1, COLOR_AXES)
+    for i in range(top, min(top + TABLE_ROWS, count)):
+        y = TABLE_TOP + (i - top) * TABLE_ROW_H
+        v = values[i]
+        fb.text(fmt(start + i * step), 12, y, COLOR_TEXT)
+        fb.text('undef' if v is None else fmt(v), 164, y, func.color)
+    fb.fill_rect(0, SCREEN_HEIGHT - 26, SCREEN_WIDTH, 1, COLOR_AXES)
+    fb.text('UP/DN LT/RT:scroll A:start B:end', 4, SCREEN_HEIGHT - 22, COLOR_AXES)
+    fb.text('D:step E:export CSV  Q:back', 4, SCREEN_HEIGHT - 10, COLOR_AXES)
+    fb.show()
+
+def export_csv(func, start, step, count, path):
+    """
+    Stream the table to a CSV file without building it in memory.
+
+    Rows are formatted one at a time and written in blocks of
+    CSV_FLUSH_ROWS lines. Returns the number of rows written.
+    """
+    f = func.fn
+    with open(path, 'w') as out:
+        out.write('x,%s\n' % func.name)
+        buf = []
+        for i in range(count):
+            x = start + i * step
+            y = f(x)
+            buf.append('%.8g,%s\n' % (x, '' if y is None else '%.8g' % y))
+            if len(buf) >= CSV_FLUSH_ROWS:
+                out.write(''.join(buf))
+                buf = []
+                fb.fill_rect(0, SCREEN_HEIGHT - 12, SCREEN_WIDTH, 12, COLOR_BG)
+                fb.text('Exporting %d/%d' % (i + 1, count), 4, SCREEN_HEIGHT - 10, COLOR_TEXT)
+                fb.show()
+        if buf:
+            out.write(''.join(buf))
+    return count
+
+def table_view(func, path_dir='/sd'):
+    """
+    Scrollable table of x and f(x).
+
+    Only rows on screen are evaluated; scrolling keeps the values already
+    visible and evaluates just the rows that scroll into view.
+    """
+    start = XMIN
+    end = XMAX
+    step = 1.0
+    top = 0
+    values = {}
+    temp = bytearray(1)
+    while True:
+        count = table_count(start, end, step)
+        top = max(0, min(top, count - TABLE_ROWS))
+        visible = range(top, min(top + TABLE_ROWS, count))
+        for i in list(values):
+            if i not in visible:
+                del values[i]
+        for i in visible:
+            if i not in values:
+                values[i] = func.fn(start + i * step)
+        draw_table(func, start, step, count, top, values)
+        while not keyboard.readinto(temp):
+            time.sleep_ms(20)
+        key = temp[0]
+        if key == 27:
+            seq = bytearray(2)
+            if keyboard.readinto(seq) and seq[0] == ord('['):
+                if seq[1] == ord('A'):
+                    top -= 1
+                elif seq[1] == ord('B'):
+                    top += 1
+                elif seq[1] == ord('D'):
+                    top -= TABLE_ROWS
+                elif seq[1] == ord('C'):
+                    top += TABLE_ROWS
             continue
-        py = y_to_py(y)
-        if 0 <= py < GRAPH_HEIGHT:
-            points.append((px, py))
-        # Draw in batches for animation
-        if px % 16 == 0:
-            for ppx, ppy in points:
-                fb.pixel(ppx, ppy, COLOR_GRAPH)
+        if key in (ord('q'), ord('Q'), ord('\r'), ord('\n')):
+            return
+        if key in (ord('a'), ord('A'), ord('b'), ord('B'), ord('d'), ord('D')):
+            if key in (ord('a'), ord('A')):
+                start = read_number('Start x: ', start)
+            elif key in (ord('b'), ord('B')):
+                end = read_number('End x: ', end)
+            else:
+                new_step = read_number('Step: ', step)
+                if new_step > 0:
+                    step = new_step
+            values = {}
+            top = 0
+        elif key in (ord('e'), ord('E')):
+            path = '%s/%s.csv' % (path_dir, func.name)
+            try:
+                n = export_csv(func, start, step, count, path)
+                msg = 'Wrote %d rows to %s' % (n, path)
+            except OSError:
+                msg = 'Export failed: ' + path
+            fb.fill_rect(0, SCREEN_HEIGHT - 12, SCREEN_WIDTH, 12, COLOR_BG)
+            fb.text(msg[:39], 4, SCREEN_HEIGHT - 10, COLOR_TEXT)
             fb.show()
-            time.sleep_ms(100)
-            points = []
-    # Draw any remaining points
-    for ppx, ppy in points:
-        fb.pixel(ppx, ppy, COLOR_GRAPH)
-    fb.show()
+            while not keyboard.readinto(temp):
+                time.sleep_ms(20)
+
+def parametric_steps(point, tmin=TMIN, tmax=TMAX, n=SCREEN_WIDTH,
+                     budget_ms=FRAME_BUDGET_MS):
+    """
+    Generator plotting point(t) -> (x, y) or None coarse to fine over
+    [tmin, tmax], yielding per frame budget.
+    """
+    start = time.ticks_ms()
+    for i in refine_order(n):
+        p = point(tmin + (tmax - tmin) * i / (n - 1))
+        if p is not None:
+            px = x_to_px(p[0])
+            py = y_to_py(p[1])
+            if 0 <= px < SCREEN_WIDTH and 0 <= py < GRAPH_HEIGHT:
+                fb.pixel(px, py, COLOR_GRAPH)
+        if time.ticks_diff(time.ticks_ms(), start) >= budget_ms:
+            yield
+            start = time.ticks_ms()
 
 def graph_parametric(expr_x, expr_y):
+    """Plot a parametric curve. Returns False if cancelled by a key press."""
     fb.fill(COLOR_BG)
     draw_axes()
     # Try to compile the expressions
     try:
-        code_x = compile(expr_x, '<expr_x>', 'eval')
-        code_y = compile(expr_y, '<expr_y>', 'eval')
+        fx = compile_expr(expr_x, 't')
+        fy = compile_expr(expr_y, 't')
     except Exception as e:
         draw_input_line(expr_x, 'Syntax Error', mode='param', expr2=expr_y)
         fb.show()
-        return
-    points = []
-    N = SCREEN_WIDTH  # Number of steps
-    for i in range(N):
-        t = TMIN + (TMAX - TMIN) * i / (N - 1)
-        try:
-            env = {'t': t}
-            extra = [
-                ('abs', abs), ('min', min), ('max', max), ('pow', pow), ('round', round),
-                ('int', int), ('float', float), ('sin', math.sin), ('cos', math.cos), ('tan', math.tan),
-                ('asin', math.asin), ('acos', math.acos), ('atan', math.atan), ('atan2', math.atan2),
-                ('log', math.log), ('log10', math.log10), ('exp', math.exp), ('sqrt', math.sqrt),
-                ('pi', math.pi), ('e', math.e), ('floor', math.floor), ('ceil', math.ceil),
-                ('sinh', math.sinh), ('cosh', math.cosh), ('tanh', math.tanh),
-                ('degrees', math.degrees), ('radians', math.radians),
-                ('math', math)
-            ]
-            for k, v in extra:
-                env[k] = v
-            x = eval(code_x, env)
-            y = eval(code_y, env)
-        except Exception:
-            continue
-        if not (isinstance(x, (int, float)) and isinstance(y, (int, float))):
-            continue
-        if math.isnan(x) or math.isinf(x) or math.isnan(y) or math.isinf(y):
+        return True
+
+    def point(t):
+        x = fx(t)
+        if x is None:
+            return None
+        y = fy(t)
+        return None if y is None else (x, y)
+    return run_steps(parametric_steps(point))
+
+def graph_polar(expr):
+    """Plot r = f(t) for t in [THETA_MIN, THETA_MAX]. Returns False if cancelled."""
+    fb.fill(COLOR_BG)
+    draw_axes()
+    try:
+        fr = compile_expr(expr, 't')
+    except Exception:
+        draw_input_line(expr, 'Syntax Error', mode='polar')
+        fb.show()
+        return True
+
+    def point(t):
+        r = fr(t)
+        return None if r is None else (r * math.cos(t), r * math.sin(t))
+    return run_steps(parametric_steps(point, THETA_MIN, THETA_MAX, POLAR_STEPS))
+
+def _contour_segment(px, py, s, a, b, c, d, color):
+    """Draw the marching-squares segment(s) for one cell with corner values
+    a (top left), b (top right), c (bottom right), d (bottom left)."""
+    edges = ((px, py, a, px + s, py, b),
+             (px + s, py, b, px + s, py + s, c),
+             (px + s, py + s, c, px, py + s, d),
+             (px, py + s, d, px, py, a))
+    pts = []
+    for x1, y1, v1, x2, y2, v2 in edges:
+        if (v1 < 0) != (v2 < 0):
+            t = v1 / (v1 - v2)
+            pts.append((int(x1 + (x2 - x1) * t + 0.5),
+                        min(int(y1 + (y2 - y1) * t + 0.5), GRAPH_HEIGHT - 1)))
+    if len(pts) >= 2:
+        fb.line(pts[0][0], pts[0][1], pts[1][0], pts[1][1], color)
+    if len(pts) == 4:
+        # Saddle cell: pair the remaining crossings
+        fb.line(pts[2][0], pts[2][1], pts[3][0], pts[3][1], color)
+
+def implicit_steps(f, cache, color=COLOR_GRAPH, cell=IMPLICIT_CELL,
+                   min_cell=IMPLICIT_MIN_CELL, budget_ms=FRAME_BUDGET_MS):
+    """
+    Generator plotting f(x, y) = 0 with marching squares.
+
+    f is sampled on a coarse grid of cell-pixel squares; only squares
+    whose corners change sign are split into quarters, down to min_cell,
+    where the crossing is drawn as interpolated line segments. Corner
+    values are memoised in cache (keyed by pixel position), so its size
+    is the number of evaluations used. Curves that enter and leave a
+    coarse cell through the same edge are not detected.
+    """
+    missing = cache  # Sentinel that can never be a sample value
+    start = time.ticks_ms()
+
+    def at(px, py):
+        k = px * 1024 + py
+        v = cache.get(k, missing)
+        if v is missing:
+            v = f(px_to_x(px), py_to_y(py))
+            cache[k] = v
+        return v
+
+    def crosses(a, b, c, d):
+        if a is None or b is None or c is None or d is None:
+            return False
+        lo = min(a, b, c, d)
+        hi = max(a, b, c, d)
+        return lo <= 0 <= hi and lo != hi
+
+    # Coarse pass, one row of cells at a time
+    stack = []
+    for py in range(0, GRAPH_HEIGHT, cell):
+        for px in range(0, SCREEN_WIDTH, cell):
+            if crosses(at(px, py), at(px + cell, py),
+                       at(px + cell, py + cell), at(px, py + cell)):
+                stack.append((px, py, cell))
+        if time.ticks_diff(time.ticks_ms(), start) >= budget_ms:
+            yield
+            start = time.ticks_ms()
+    # Refine only where the sign changes
+    while stack:
+        px, py, s = stack.pop()
+        a = at(px, py)
+        b = at(px + s, py)
+        c = at(px + s, py + s)
+        d = at(px, py + s)
+        if not crosses(a, b, c, d):
             continue
-        px = x_to_px(x)
-        py = y_to_py(y)
-        if 0 <= px < SCREEN_WIDTH and 0 <= py < GRAPH_HEIGHT:
-            points.append((px, py))
-        # Draw in batches for animation
-        if i % 16 == 0:
-            for ppx, ppy in points:
-                fb.pixel(ppx, ppy, COLOR_GRAPH)
-            fb.show()
-            time.sleep_ms(100)
-            points = []
-    for ppx, ppy in points:
-        fb.pixel(ppx, ppy, COLOR_GRAPH)
+        if s <= min_cell:
+            _contour_segment(px, py, s, a, b, c, d, color)
+        else:
+            h = s // 2
+            stack.append((px, py, h))
+            stack.append((px + h, py, h))
+            stack.append((px, py + h, h))
+            stack.append((px + h, py + h, h))
+        if time.ticks_diff(time.ticks_ms(), start) >= budget_ms:
+            yield
+            start = time.ticks_ms()
+
+def graph_implicit(expr):
+    """Plot f(x, y) = 0. Returns False if cancelled by a key press."""
+    fb.fill(COLOR_BG)
+    draw_axes()
+    try:
+        f = compile_implicit(expr)
+    except Exception:
+        draw_input_line(expr, 'Syntax Error', mode='implicit')
+        fb.show()
+        return True
+    cache = {}
+    if not run_steps(implicit_steps(f, cache)):
+        return False
+    draw_input_line(expr, mode='implicit')
+    fb.text('%d evals' % len(cache), 4, GRAPH_HEIGHT + 20, COLOR_AXES)
     fb.show()
+    return True
 
 def main():
-    mode = 'normal'  # 'normal' or 'param'
+    mode = 'normal'  # One of MODES
+    mode_exprs = dict(MODE_DEFAULTS)  # Last expression used in polar/implicit
     expr = "sin(x)*cos(x/2) + exp(-x**2/10)"
     expr2 = "sin(t)"  # default y(t) for parametric
+    funcs = [PlotFunc('y%d' % (i + 1), FUNC_COLORS[i]) for i in range(NUM_FUNCS)]
+    funcs[0].expr = expr
+    active = 0  # Slot being edited in normal mode
     input_buffer = list(expr)
     input_buffer2 = list(expr2)
     cursor = len(input_buffer)
@@ -179,8 +1018,12 @@ def main():
         draw_axes()
         if mode == 'param':
             draw_input_line(''.join(input_buffer), mode='param', expr2=''.join(input_buffer2))
+        elif mode in MODE_PREFIX:
+            draw_input_line(''.join(input_buffer), mode=mode)
         else:
-            draw_input_line(''.join(input_buffer))
+            # Keep the last plots visible while editing
+            draw_cached(funcs)
+            draw_input_line(''.join(input_buffer), funcs=funcs, active=active)
         fb.show()
         # Input loop for editing
         editing = True
@@ -208,6 +1051,13 @@ def main():
                                 else:
                                     if cursor > 0:
                                         cursor -= 1
+                            elif seq[1] in (ord('A'), ord('B')) and mode == 'normal':
+                                # Up/Down arrow: switch function slot
+                                funcs[active].expr = ''.join(input_buffer)
+                                step = -1 if seq[1] == ord('A') else 1
+                                active = (active + step) % NUM_FUNCS
+                                input_buffer = list(funcs[active].expr)
+                                cursor = len(input_buffer)
                     continue  # Don't insert ESC or '['
                 if key in (ord('\r'), ord('\n')):
                     if mode == 'param' and not editing_y:
@@ -232,18 +1082,22 @@ def main():
                         cursor = 0
                 elif key in (ord('q'), ord('Q')):
                     return
-                elif key == ord('m'):  # Toggle mode
+                elif key == ord('m'):  # Cycle mode
                     if mode == 'normal':
-                        mode = 'param'
-                        editing_y = False
+                        funcs[active].expr = ''.join(input_buffer)
+                    elif mode in MODE_PREFIX:
+                        mode_exprs[mode] = ''.join(input_buffer)
+                    mode = MODES[(MODES.index(mode) + 1) % len(MODES)]
+                    editing_y = False
+                    if mode == 'param':
                         input_buffer = list("cos(2*t)*(1+0.5*sin(5*t))")
                         input_buffer2 = list("sin(2*t)*(1+0.5*sin(5*t))")
-                        cursor = len(input_buffer)
                         cursor2 = len(input_buffer2)
+                    elif mode == 'normal':
+                        input_buffer = list(funcs[active].expr)
                     else:
-                        mode = 'normal'
-                        input_buffer = list(expr)
-                        cursor = len(input_buffer)
+                        input_buffer = list(mode_exprs[mode])
+                    cursor = len(input_buffer)
                 elif 32 <= key <= 126:
                     if mode == 'param' and editing_y:
                         input_buffer2.insert(cursor2, chr(key))
@@ -263,20 +1117,34 @@ def main():
                     cursor_x = 4 + 6 * len('x(t)=' + ''.join(input_buffer[:cursor]))
                     cursor_y = GRAPH_HEIGHT + 4
                 fb.fill_rect(cursor_x, cursor_y, 6, 8, COLOR_TEXT)
+            elif mode in MODE_PREFIX:
+                draw_input_line(''.join(input_buffer), mode=mode)
+                cursor_x = 4 + 6 * len(MODE_PREFIX[mode] + ''.join(input_buffer[:cursor]))
+                fb.fill_rect(cursor_x, GRAPH_HEIGHT + 4, 6, 8, COLOR_TEXT)
             else:
-                draw_input_line(''.join(input_buffer))
+                draw_input_line(''.join(input_buffer), funcs=funcs, active=active)
                 cursor_x = 4 + 6 * len('y = ' + ''.join(input_buffer[:cursor]))
                 fb.fill_rect(cursor_x, GRAPH_HEIGHT + 4, 6, 8, COLOR_TEXT)
             fb.show()
             time.sleep_ms(30)
         # Graph the equation
         if mode == 'param':
-            graph_parametric(''.join(input_buffer), ''.join(input_buffer2))
+            done = graph_parametric(''.join(input_buffer), ''.join(input_buffer2))
+        elif mode == 'polar':
+            done = graph_polar(''.join(input_buffer))
+        elif mode == 'implicit':
+            done = graph_implicit(''.join(input_buffer))
         else:
-            graph_equation(''.join(input_buffer))
-        # Wait for any key to return to input
-        while not keyboard.readinto(temp):
-            pass
+            funcs[active].expr = ''.join(input_buffer)
+            done = graph_functions(funcs, active)
+        if not done:
+            continue  # Cancelled mid-plot: straight back to editing
+        if mode == 'normal':
+            graph_view(funcs, active)
+        else:
+            # Wait for any key to return to input
+            while not keyboard.readinto(temp):
+                pass
 
 if __name__ == "__main__":
     main()
@@ -20,99 +20,472 @@ GRID_W = 12  # 12x12 grid
 GRID_H = 12
 NUM_MINES = 20
 
+# (name, width, height, mines)
+PRESETS = (
+    ("Beginner", 9, 9, 10),
+    ("Intermediate", 16, 16, 40),
+    ("Expert", 30, 16, 99),
+)
 
-def draw_cell(x, y, value, revealed, flagged):
+# Visible part of the board; larger boards scroll to follow the cursor
+GRID_TOP = 20
+VIEW_COLS = SCREEN_WIDTH // CELL_SIZE                 # 16
+VIEW_ROWS = (SCREEN_HEIGHT - 2 * GRID_TOP) // CELL_SIZE  # 14
+view = [0, 0]  # Top-left board cell shown on screen
+
+# No-guess generation: give up and fall back to a plain board after this
+# long, and only enumerate frontier groups up to this many cells
+NO_GUESS_BUDGET_MS = 3000
+MAX_ENUM_CELLS = 14
+
+
+# Board: one byte per cell, row-major with a one-cell border all round so
+# every cell has eight neighbours at fixed index offsets (no bounds checks).
+COUNT_MASK = 0x0F   # Adjacent mine count
+MINE = 0x10
+REVEALED = 0x20
+FLAGGED = 0x40
+BORDER = 0x80       # Border cells are also marked REVEALED so floods stop there
+
+STRIDE = GRID_W + 2
+OFFSETS = (-STRIDE - 1, -STRIDE, -STRIDE + 1, -1, 1, STRIDE - 1, STRIDE, STRIDE + 1)
+
+
+def set_size(width, height, mines):
+    """Switch board dimensions (call before new_board)."""
+    global GRID_W, GRID_H, NUM_MINES, STRIDE, OFFSETS
+    GRID_W = width
+    GRID_H = height
+    NUM_MINES = mines
+    STRIDE = GRID_W + 2
+    OFFSETS = (-STRIDE - 1, -STRIDE, -STRIDE + 1, -1, 1, STRIDE - 1, STRIDE, STRIDE + 1)
+    view[0] = 0
+    view[1] = 0
+
+def index(x, y):
+    return (y + 1) * STRIDE + x + 1
+
+def coords(i):
+    return i % STRIDE - 1, i // STRIDE - 1
+
+def new_board():
+    board = bytearray(STRIDE * (GRID_H + 2))
+    for i in range(len(board)):
+        x, y = coords(i)
+        if not (0 <= x < GRID_W and 0 <= y < GRID_H):
+            board[i] = BORDER | REVEALED
+    return board
+
+def draw_cell(board, i):
+    x, y = coords(i)
+    x -= view[0]
+    y -= view[1]
+    if not (0 <= x < VIEW_COLS and 0 <= y < VIEW_ROWS):
+        return  # Scrolled out of view
+    cell = board[i]
     px = x * CELL_SIZE
-    py = y * CELL_SIZE + 20
+    py = y * CELL_SIZE + GRID_TOP
     # Cell background
-    if revealed:
+    if cell & REVEALED:
         fb.fill_rect(px, py, CELL_SIZE, CELL_SIZE, COLOR_SAFE)
     else:
         fb.fill_rect(px, py, CELL_SIZE, CELL_SIZE, COLOR_BG)
     # Cell border
     fb.rect(px, py, CELL_SIZE, CELL_SIZE, COLOR_GRID)
     # Content
-    if revealed:
-        if value == -1:
+    if cell & REVEALED:
+        if cell & MINE:
             fb.text("*", px + 6, py + 2, COLOR_MINE)
-        elif value > 0:
-            fb.text(str(value), px + 6, py + 2, COLOR_TEXT)
-    elif flagged:
+        elif cell & COUNT_MASK:
+            fb.text(str(cell & COUNT_MASK), px + 6, py + 2, COLOR_TEXT)
+    elif cell & FLAGGED:
         fb.text("F", px + 6, py + 2, COLOR_FLAG)
 
-def draw_grid(grid, revealed, flagged, cursor):
-    for y in range(GRID_H):
-        for x in range(GRID_W):
-            draw_cell(x, y, grid[y][x], revealed[y][x], flagged[y][x])
-    # Draw cursor
-    cx, cy = cursor
-    px = cx * CELL_SIZE
-    py = cy * CELL_SIZE + 20
-    fb.rect(px, py, CELL_SIZE, CELL_SIZE, COLOR_FLAG)
+def draw_cursor(cursor):
+    cx = cursor[0] - view[0]
+    cy = cursor[1] - view[1]
+    fb.rect(cx * CELL_SIZE, cy * CELL_SIZE + GRID_TOP, CELL_SIZE, CELL_SIZE, COLOR_FLAG)
+
+def draw_header(mines_left):
+    fb.fill_rect(0, 0, SCREEN_WIDTH, GRID_TOP, COLOR_BG)
+    fb.text("MINESWEEPER", 90, 2, COLOR_TEXT)
+    fb.text("*%d" % mines_left, SCREEN_WIDTH - 40, 2, COLOR_MINE)
+
+def draw_footer():
+    fb.fill_rect(0, SCREEN_HEIGHT - GRID_TOP, SCREEN_WIDTH, GRID_TOP, COLOR_BG)
+    fb.text("Space:Reveal/Chord F:Flag Q:Quit", 10, 300, COLOR_TEXT)
+
+def draw_grid(board, cursor):
+    for y in range(view[1], min(GRID_H, view[1] + VIEW_ROWS)):
+        for x in range(view[0], min(GRID_W, view[0] + VIEW_COLS)):
+            draw_cell(board, index(x, y))
+    draw_cursor(cursor)
     fb.show()
 
-def place_mines(grid, first_x, first_y):
-    # Place NUM_MINES mines, avoiding (first_x, first_y)
-    positions = [(x, y) for x in range(GRID_W) for y in range(GRID_H)
-                 if not (x == first_x and y == first_y)]
+def follow_cursor(board, cursor, mines_left):
+    """
+    Scroll the view to keep the cursor visible.
+
+    A one-cell step shifts the framebuffer and paints just the row or
+    column that scrolled in; anything else repaints the visible grid.
+    """
+    vx = min(max(view[0], cursor[0] - VIEW_COLS + 1), cursor[0])
+    vy = min(max(view[1], cursor[1] - VIEW_ROWS + 1), cursor[1])
+    dx = vx - view[0]
+    dy = vy - view[1]
+    if not dx and not dy:
+        return
+    view[0] = vx
+    view[1] = vy
+    if abs(dx) + abs(dy) == 1 and hasattr(fb, "scroll"):
+        fb.scroll(-dx * CELL_SIZE, -dy * CELL_SIZE)
+        if dx:
+            x = vx + (VIEW_COLS - 1 if dx > 0 else 0)
+            cells = [index(x, y) for y in range(vy, min(GRID_H, vy + VIEW_ROWS))]
+        else:
+            y = vy + (VIEW_ROWS - 1 if dy > 0 else 0)
+            cells = [index(x, y) for x in range(vx, min(GRID_W, vx + VIEW_COLS))]
+        for i in cells:
+            draw_cell(board, i)
+    else:
+        fb.fill_rect(0, GRID_TOP, SCREEN_WIDTH, VIEW_ROWS * CELL_SIZE, COLOR_BG)
+        draw_grid(board, cursor)
+    # The scroll also moved the header and footer
+    draw_header(mines_left)
+    draw_footer()
+
+def draw_changed(board, changed, cursor):
+    """Redraw only the cells in changed, then the cursor on top."""
+    for i in changed:
+        draw_cell(board, i)
+    draw_cursor(cursor)
+    fb.show()
+
+def place_mines(board, first_x, first_y, open_start=False):
+    # Place NUM_MINES mines, avoiding (first_x, first_y) and, with
+    # open_start, its neighbours too so the first click opens an area
+    first = index(first_x, first_y)
+    keep_clear = [first]
+    if open_start:
+        keep_clear += [first + off for off in OFFSETS if not board[first + off] & BORDER]
+    positions = [index(x, y) for y in range(GRID_H) for x in range(GRID_W)]
+    for i in keep_clear:
+        positions.remove(i)
     # Manual shuffle for MicroPython
     n = len(positions)
     for i in range(n-1, 0, -1):
         j = random.randint(0, i)
         positions[i], positions[j] = positions[j], positions[i]
-    for i in range(NUM_MINES):
-        x, y = positions[i]
-        grid[y][x] = -1
-    # Fill in numbers
-    for y in range(GRID_H):
-        for x in range(GRID_W):
-            if grid[y][x] == -1:
-                continue
-            count = 0
-            for dy in (-1, 0, 1):
-                for dx in (-1, 0, 1):
-                    nx, ny = x + dx, y + dy
-                    if 0 <= nx < GRID_W and 0 <= ny < GRID_H:
-                        if grid[ny][nx] == -1:
-                            count += 1
-            grid[y][x] = count
-
-def reveal(grid, revealed, flagged, x, y):
-    if flagged[y][x] or revealed[y][x]:
-        return
-    revealed[y][x] = True
-    if grid[y][x] == 0:
-        # Flood fill
-        for dy in (-1, 0, 1):
-            for dx in (-1, 0, 1):
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < GRID_W and 0 <= ny < GRID_H:
-                    if not revealed[ny][nx]:
-                        reveal(grid, revealed, flagged, nx, ny)
-
-def check_win(grid, revealed, flagged):
-    for y in range(GRID_H):
-        for x in range(GRID_W):
-            if grid[y][x] != -1 and not revealed[y][x]:
-                return False
+    for i in positions[:NUM_MINES]:
+        board[i] |= MINE
+        # Count up the neighbours instead of rescanning every cell
+        for off in OFFSETS:
+            board[i + off] += 1
+    # Border cells picked up counts above; restore them
+    for i in range(len(board)):
+        if board[i] & BORDER:
+            board[i] = BORDER | REVEALED
+
+def reveal(board, x, y):
+    """
+    Reveal (x, y), flood-filling from empty cells with a queue.
+
+    Returns the indices of every cell that changed, in reveal order.
+    Flagged cells are left alone, as before.
+    """
+    start = index(x, y)
+    if board[start] & (REVEALED | FLAGGED):
+        return []
+    board[start] |= REVEALED
+    changed = [start]
+    head = 0
+    # changed doubles as the BFS queue; cells are marked on enqueue
+    while head < len(changed):
+        i = changed[head]
+        head += 1
+        if board[i] & (MINE | COUNT_MASK):
+            continue
+        for off in OFFSETS:
+            j = i + off
+            if not board[j] & (REVEALED | FLAGGED):
+                board[j] |= REVEALED
+                changed.append(j)
+    return changed
+
+def chord(board, x, y):
+    """
+    Reveal every unflagged neighbour of a revealed number once the right
+    number of flags surrounds it.
+
+    Returns (changed cells, True if a mine was uncovered).
+    """
+    i = index(x, y)
+    cell = board[i]
+    if not cell & REVEALED or not cell & COUNT_MASK:
+        return [], False
+    flags = 0
+    for off in OFFSETS:
+        if board[i + off] & FLAGGED:
+            flags += 1
+    if flags != cell & COUNT_MASK:
+        return [], False
+    changed = []
+    boom = False
+    for off in OFFSETS:
+        j = i + off
+        if board[j] & (REVEALED | FLAGGED):
+            continue
+        if board[j] & MINE:
+            board[j] |= REVEALED
+            changed.append(j)
+            boom = True
+        else:
+            nx, ny = coords(j)
+            changed += reveal(board, nx, ny)
+    return changed, boom
+
+def _constraints(board):
+    """
+    One (unknown cells, mines among them) pair per revealed number that
+    still borders unknown cells. Flagged cells count as known mines.
+    """
+    out = []
+    for i in range(len(board)):
+        cell = board[i]
+        if cell & (REVEALED | BORDER | MINE) != REVEALED or not cell & COUNT_MASK:
+            continue
+        need = cell & COUNT_MASK
+        unknown = []
+        for off in OFFSETS:
+            j = i + off
+            if board[j] & FLAGGED:
+                need -= 1
+            elif not board[j] & REVEALED:
+                unknown.append(j)
+        if unknown:
+            out.append((unknown, need))
+    return out
+
+def _enumerate(cells, cons):
+    """
+    Count, over every consistent mine assignment of cells, how often each
+    cell is a mine. Returns (solutions, per-cell counts).
+
+    Depth is bounded by MAX_ENUM_CELLS, so plain recursion is safe here.
+    """
+    pos = {c: n for n, c in enumerate(cells)}
+    # Each constraint: list of cell positions, mines needed
+    cons = [([pos[c] for c in unknown], need) for unknown, need in cons]
+    by_cell = [[] for _ in cells]
+    for k, (members, _) in enumerate(cons):
+        for m in members:
+            by_cell[m].append(k)
+    placed = [0] * len(cons)   # mines assigned so far per constraint
+    left = [len(m) for m, _ in cons]  # cells still unassigned per constraint
+    assign = bytearray(len(cells))
+    hits = [0] * len(cells)
+    total = [0]
+
+    def step(n):
+        if n == len(cells):
+            total[0] += 1
+            for m in range(len(cells)):
+                hits[m] += assign[m]
+            return
+        for v in (0, 1):
+            ok = True
+            for k in by_cell[n]:
+                placed[k] += v
+                left[k] -= 1
+                need = cons[k][1]
+                if placed[k] > need or placed[k] + left[k] < need:
+                    ok = False
+            if ok:
+                assign[n] = v
+                step(n + 1)
+            for k in by_cell[n]:
+                placed[k] -= v
+                left[k] += 1
+    step(0)
+    return total[0], hits
+
+def deduce(board):
+    """
+    Find cells that are certainly safe or certainly mines.
+
+    Tries, in order of cost: single-constraint rules, subset reasoning
+    between overlapping constraints, then exhaustive enumeration of small
+    connected frontier groups. Returns (safe cells, mine cells).
+    """
+    cons = _constraints(board)
+    safe = set()
+    mines = set()
+    for unknown, need in cons:
+        if need == 0:
+            safe.update(unknown)
+        elif need == len(unknown):
+            mines.update(unknown)
+    if safe or mines:
+        return safe, mines
+    # Subset reasoning: if A's cells are inside B's, B minus A holds the rest
+    sets = [(set(u), n) for u, n in cons]
+    touching = {}
+    for k, (cells, _) in enumerate(sets):
+        for c in cells:
+            touching.setdefault(c, []).append(k)
+    for a, (sa, na) in enumerate(sets):
+        seen = set()
+        for c in sa:
+            for b in touching[c]:
+                if b == a or b in seen:
+                    continue
+                seen.add(b)
+                sb, nb = sets[b]
+                if len(sa) < len(sb) and sa.issubset(sb):
+                    rest = sb - sa
+                    if nb == na:
+                        safe.update(rest)
+                    elif nb - na == len(rest):
+                        mines.update(rest)
+        if safe or mines:
+            return safe, mines
+    # Enumerate each connected group of frontier cells that is small enough
+    group_of = {}
+    groups = []
+    for k, (cells, _) in enumerate(sets):
+        merged = set()
+        for c in cells:
+            if c in group_of:
+                merged.add(group_of[c])
+        g = len(groups)
+        groups.append([set(cells), [k]])
+        for m in merged:
+            groups[g][0] |= groups[m][0]
+            groups[g][1] += groups[m][1]
+            groups[m] = None
+        for c in groups[g][0]:
+            group_of[c] = g
+    for group in groups:
+        if group is None or len(group[0]) > MAX_ENUM_CELLS:
+            continue
+        cells = list(group[0])
+        n, hits = _enumerate(cells, [cons[k] for k in group[1]])
+        if not n:
+            continue
+        for c, h in zip(cells, hits):
+            if h == 0:
+                safe.add(c)
+            elif h == n:
+                mines.add(c)
+    return safe, mines
+
+def solvable(board, first_x, first_y):
+    """True if the board can be cleared from (first_x, first_y) by deduction alone."""
+    work = bytearray(board)
+    todo = GRID_W * GRID_H - NUM_MINES - len(reveal(work, first_x, first_y))
+    while todo > 0:
+        safe, mines = deduce(work)
+        if not safe and not mines:
+            return False
+        for i in mines:
+            work[i] |= FLAGGED
+        for i in safe:
+            if not work[i] & REVEALED:
+                x, y = coords(i)
+                todo -= len(reveal(work, x, y))
     return True
 
+def generate_no_guess(first_x, first_y, budget_ms=NO_GUESS_BUDGET_MS):
+    """
+    Deal boards until one can be cleared without guessing.
+
+    Returns (board, attempts, ok). If the time budget runs out, the last
+    plain board is returned with ok False so play can still start.
+    """
+    start = time.ticks_ms()
+    attempts = 0
+    while True:
+        board = new_board()
+        place_mines(board, first_x, first_y, open_start=True)
+        attempts += 1
+        if solvable(board, first_x, first_y):
+            return board, attempts, True
+        if time.ticks_diff(time.ticks_ms(), start) >= budget_ms:
+            return board, attempts, False
+
+def benchmark_no_guess(games=10):
+    """Print no-guess generation time and success rate for each preset."""
+    for name, w, h, mines in PRESETS:
+        set_size(w, h, mines)
+        ok = 0
+        tries = 0
+        t0 = time.ticks_ms()
+        for _ in range(games):
+            _, attempts, found = generate_no_guess(w // 2, h // 2)
+            ok += found
+            tries += attempts
+        ms = time.ticks_diff(time.ticks_ms(), t0)
+        print("%s: %d/%d found, %.1f boards/game, %d ms/game"
+              % (name, ok, games, tries / games, ms // games))
+
+def select_preset():
+    """Pick a board size. Returns (PRESETS entry, no_guess), or None to quit."""
+    selected = 0
+    no_guess = False
+    temp = bytearray(1)
+    while True:
+        fb.fill(COLOR_BG)
+        fb.text("MINESWEEPER", 110, 60, COLOR_TEXT)
+        for n, (name, w, h, mines) in enumerate(PRESETS):
+            label = "%s %dx%d, %d mines" % (name, w, h, mines)
+            fb.text(("> " if n == selected else "  ") + label, 20, 120 + n * 20,
+                    COLOR_FLAG if n == selected else COLOR_TEXT)
+        fb.text("N: No-guess board [%s]" % ("on" if no_guess else "off"), 20, 200,
+                COLOR_FLAG if no_guess else COLOR_TEXT)
+        fb.text("UP/DOWN: Select  ENTER: Start", 20, 260, COLOR_TEXT)
+        fb.show()
+        while not keyboard.readinto(temp):
+            time.sleep_ms(30)
+        key = temp[0]
+        if key == 27:
+            seq = bytearray(2)
+            if keyboard.readinto(seq) and seq[0] == ord('['):
+                if seq[1] == ord('A'):
+                    selected = (selected - 1) % len(PRESETS)
+                elif seq[1] == ord('B'):
+                    selected = (selected + 1) % len(PRESETS)
+        elif key in (13, 10):
+            return PRESETS[selected], no_guess
+        elif key in (ord('n'), ord('N')):
+            no_guess = not no_guess
+        elif key in (ord('q'), ord('Q')):
+            return None
+
 def main():
-    grid = [[0]*GRID_W for _ in range(GRID_H)]
-    revealed = [[False]*GRID_W for _ in range(GRID_H)]
-    flagged = [[False]*GRID_W for _ in range(GRID_H)]
+    choice = select_preset()
+    if choice is None:
+        return
+    preset, no_guess = choice
+    set_size(preset[1], preset[2], preset[3])
+    board = new_board()
     cursor = [0, 0]
+    safe_cells = GRID_W * GRID_H - NUM_MINES
+    revealed = 0  # Safe cells revealed so far, for an O(1) win check
+    flags = 0
     mines_placed = False
     game_over = False
     win = False
     temp = bytearray(1)
     fb.fill(COLOR_BG)
-    fb.text("MINESWEEPER", 90, 2, COLOR_TEXT)
-    fb.text("Arrows: Move  Space: Reveal  F: Flag  Q: Quit", 10, 300, COLOR_TEXT)
-    draw_grid(grid, revealed, flagged, cursor)
+    draw_header(NUM_MINES)
+    draw_footer()
+    draw_grid(board, cursor)
     while True:
+        changed = None
         if keyboard.readinto(temp):
             key = temp[0]
+            here = index(cursor[0], cursor[1])
+            changed = [here]  # Cursor cell is always repainted
             if key == 27:  # ESC sequence for arrows
                 seq = bytearray(2)
                 if keyboard.readinto(seq):
@@ -125,24 +498,55 @@ def main():
                             cursor[0] += 1
                         elif seq[1] == ord('D') and cursor[0] > 0:
                             cursor[0] -= 1
+                follow_cursor(board, cursor, NUM_MINES - flags)
             elif key in (ord('q'), ord('Q')):
                 return
-            elif key == ord(' '):  # Reveal
+            elif key == ord(' '):  # Reveal, or chord on a number
                 if not mines_placed:
-                    place_mines(grid, cursor[0], cursor[1])
+                    if no_guess:
+                        fb.fill_rect(0, SCREEN_HEIGHT - GRID_TOP, SCREEN_WIDTH, GRID_TOP, COLOR_BG)
+                        fb.text("Generating no-guess board...", 10, 300, COLOR_TEXT)
+                        fb.show()
+                        flagged = board
+                        board, _, found = generate_no_guess(cursor[0], cursor[1])
+                        # Keep flags placed before the first reveal
+                        for i in range(len(board)):
+                            if flagged[i] & FLAGGED and not board[i] & REVEALED:
+                                board[i] |= FLAGGED
+                        draw_footer()
+                        if not found:
+                            # Budget ran out: say so until the footer repaints
+                            fb.fill_rect(0, SCREEN_HEIGHT - GRID_TOP, SCREEN_WIDTH, GRID_TOP, COLOR_BG)
+                            fb.text("No guess-free board, may need luck", 10, 300, COLOR_MINE)
+                    else:
+                        place_mines(board, cursor[0], cursor[1])
                     mines_placed = True
-                if not flagged[cursor[1]][cursor[0]] and not revealed[cursor[1]][cursor[0]]:
-                    if grid[cursor[1]][cursor[0]] == -1:
-                        revealed[cursor[1]][cursor[0]] = True
+                if board[here] & REVEALED:
+                    opened, boom = chord(board, cursor[0], cursor[1])
+                    changed += opened
+                    for j in opened:
+                        if not board[j] & MINE:
+                            revealed += 1
+                    if boom:
+                        game_over = True
+                        win = False
+                elif not board[here] & FLAGGED:
+                    if board[here] & MINE:
+                        board[here] |= REVEALED
                         game_over = True
                         win = False
                     else:
-                        reveal(grid, revealed, flagged, cursor[0], cursor[1])
+                        opened = reveal(board, cursor[0], cursor[1])
+                        changed += opened
+                        revealed += len(opened)
             elif key in (ord('f'), ord('F')):  # Flag
-                if not revealed[cursor[1]][cursor[0]]:
-                    flagged[cursor[1]][cursor[0]] = not flagged[cursor[1]][cursor[0]]
-        draw_grid(grid, revealed, flagged, cursor)
-        if not game_over and mines_placed and check_win(grid, revealed, flagged):
+                if not board[here] & REVEALED:
+                    board[here] ^= FLAGGED
+                    flags += 1 if board[here] & FLAGGED else -1
+                    draw_header(NUM_MINES - flags)
+        if changed:
+            draw_changed(board, changed, cursor)
+        if not game_over and revealed == safe_cells:
             game_over = True
             win = True
         if game_over:
@@ -4,6 +4,8 @@ import time
 import picocalc
 from picocalc import keyboard
 import random
+from array import array
+from gameloop import GameLoop
 
 # Display setup
 fb = picocalc.display
@@ -22,44 +24,107 @@ GRID_SIZE = 16  # Size of each grid cell
 GRID_WIDTH = SCREEN_WIDTH // GRID_SIZE
 GRID_HEIGHT = (SCREEN_HEIGHT - 40) // GRID_SIZE  # Leave space for score
 OFFSET_Y = 30  # Offset for score display
+NUM_CELLS = GRID_WIDTH * GRID_HEIGHT
+FOOD_PROBES = 8  # Random tries before falling back to scanning free cells
+
+WALL_COLOR = 1  # Blue
+
+# Boundary wall strips (x, y, w, h); snake cells on the edge overlap them
+_x1 = GRID_WIDTH * GRID_SIZE
+_y1 = OFFSET_Y + GRID_HEIGHT * GRID_SIZE
+WALLS = (
+    (0, OFFSET_Y, _x1, 2),        # Top
+    (0, _y1 - 2, _x1, 2),         # Bottom
+    (0, OFFSET_Y, 2, _y1 - OFFSET_Y),   # Left
+    (_x1 - 2, OFFSET_Y, 2, _y1 - OFFSET_Y),  # Right
+)
+
+# Cells are numbered y * GRID_WIDTH + x
+def cell_xy(i):
+    y, x = divmod(i, GRID_WIDTH)
+    return x, y
 
 class Snake:
+    """
+    The body is a ring buffer of cell numbers, head first, with a bytearray
+    marking occupied cells so collision tests are a single lookup.
+    """
     def __init__(self):
         # Start in the middle
         start_x = GRID_WIDTH // 2
         start_y = GRID_HEIGHT // 2
-        self.body = [(start_x, start_y), (start_x - 1, start_y), (start_x - 2, start_y)]
+        self.cells = array('H', bytes(2 * NUM_CELLS))
+        self.occupied = bytearray(NUM_CELLS)
+        self.head = 0    # Ring index of the head
+        self.length = 0
+        # Moves since the last render; the ring buffer still holds the
+        # cells, so several updates can be painted in one go
+        self.advanced = 0  # Heads pushed
+        self.vacated = 0   # Tail cells released
+        for x in (start_x - 2, start_x - 1, start_x):
+            self._push_head(start_y * GRID_WIDTH + x)
         self.direction = (1, 0)  # Moving right
         self.next_direction = (1, 0)
         self.growing = False
-        
+
+    def _push_head(self, cell):
+        self.head = (self.head + 1) % NUM_CELLS
+        self.cells[self.head] = cell
+        self.occupied[cell] = 1
+        self.length += 1
+
+    def head_cell(self):
+        return self.cells[self.head]
+
+    def tail_cell(self):
+        return self.cells[(self.head - self.length + 1) % NUM_CELLS]
+
+    def segments(self):
+        # Cell numbers from head to tail
+        for k in range(self.length):
+            yield self.cells[(self.head - k) % NUM_CELLS]
+
+    def new_heads(self):
+        # Cells the head entered since the last render, still in the body
+        for k in range(min(self.advanced, self.length)):
+            yield self.cells[(self.head - k) % NUM_CELLS]
+
+    def vacated_cells(self):
+        # Tail cells released since the last render
+        tail = self.head - self.length + 1
+        for k in range(1, min(self.vacated, NUM_CELLS - self.length) + 1):
+            yield self.cells[(tail - k) % NUM_CELLS]
+
     def update(self):
         # Update direction (prevent 180-degree turns)
         if self.next_direction[0] != -self.direction[0] or self.next_direction[1] != -self.direction[1]:
             self.direction = self.next_direction
         
         # Calculate new head position
-        head = self.body[0]
-        new_head = (head[0] + self.direction[0], head[1] + self.direction[1])
+        x, y = cell_xy(self.head_cell())
+        x += self.direction[0]
+        y += self.direction[1]
         
         # Check collision with walls
-        if (new_head[0] < 0 or new_head[0] >= GRID_WIDTH or
-            new_head[1] < 0 or new_head[1] >= GRID_HEIGHT):
+        if x < 0 or x >= GRID_WIDTH or y < 0 or y >= GRID_HEIGHT:
             return False
         
         # Check collision with self
-        if new_head in self.body:
+        new_head = y * GRID_WIDTH + x
+        if self.occupied[new_head]:
             return False
         
-        # Add new head
-        self.body.insert(0, new_head)
-        
         # Remove tail unless growing
         if not self.growing:
-            self.body.pop()
+            self.occupied[self.tail_cell()] = 0
+            self.length -= 1
+            self.vacated += 1
         else:
             self.growing = False
         
+        # Add new head
+        self._push_head(new_head)
+        self.advanced += 1
         return True
     
     def grow(self):
@@ -74,13 +139,29 @@ class Game:
         self.food = self.spawn_food()
         self.score = 0
         self.game_over = False
+        # What render() last put on screen
+        self.drawn_score = None
+        self.drawn_food = None
         
     def spawn_food(self):
-        while True:
-            x = random.randint(0, GRID_WIDTH - 1)
-            y = random.randint(0, GRID_HEIGHT - 1)
-            if (x, y) not in self.snake.body:
-                return (x, y)
+        """Pick a free cell uniformly, or None when the snake fills the board."""
+        occupied = self.snake.occupied
+        # A few random probes almost always hit while the board is open
+        for _ in range(FOOD_PROBES):
+            i = random.randint(0, NUM_CELLS - 1)
+            if not occupied[i]:
+                return i
+        # Crowded board: count down to the k-th free cell, no retries
+        free = NUM_CELLS - self.snake.length
+        if free <= 0:
+            return None
+        k = random.randint(0, free - 1)
+        for i in range(NUM_CELLS):
+            if not occupied[i]:
+                if k == 0:
+                    return i
+                k -= 1
+        return None
     
     def update(self):
         if self.game_over:
@@ -92,46 +173,82 @@ class Game:
             return
         
         # Check if snake ate food
-        if self.snake.body[0] == self.food:
+        if self.snake.head_cell() == self.food:
             self.snake.grow()
             self.score += 10
             self.food = self.spawn_food()
+            if self.food is None:  # Board full
+                self.game_over = True
     
     def draw(self):
+        """Repaint the whole screen."""
         fb.fill(COLOR_BG)
         # Draw boundary wall
-        wall_color = 1  # Blue
-        x0 = 0
-        y0 = OFFSET_Y
-        x1 = GRID_WIDTH * GRID_SIZE
-        y1 = OFFSET_Y + GRID_HEIGHT * GRID_SIZE
-        # Top and bottom
-        fb.fill_rect(x0, y0, x1, 2, wall_color)
-        fb.fill_rect(x0, y1-2, x1, 2, wall_color)
-        # Left and right
-        fb.fill_rect(x0, y0, 2, y1-y0, wall_color)
-        fb.fill_rect(x1-2, y0, 2, y1-y0, wall_color)
+        for wall in WALLS:
+            fb.fill_rect(wall[0], wall[1], wall[2], wall[3], WALL_COLOR)
 
         # Draw score
-        fb.text(f"Score: {self.score}", 10, 10, COLOR_TEXT)
         fb.text("Q: Quit", SCREEN_WIDTH - 70, 10, COLOR_TEXT)
+        self.drawn_score = None
+        self.drawn_food = None
 
         # Draw snake
-        for segment in self.snake.body:
-            x = segment[0] * GRID_SIZE
-            y = segment[1] * GRID_SIZE + OFFSET_Y
-            fb.fill_rect(x, y, GRID_SIZE - 1, GRID_SIZE - 1, COLOR_SNAKE)
+        for segment in self.snake.segments():
+            self._fill_cell(segment, COLOR_SNAKE)
+        self.snake.advanced = 0
+        self.snake.vacated = 0
+        self.render_hud()
 
-        # Draw food
-        fx = self.food[0] * GRID_SIZE
-        fy = self.food[1] * GRID_SIZE + OFFSET_Y
-        fb.fill_rect(fx, fy, GRID_SIZE - 1, GRID_SIZE - 1, COLOR_FOOD)
+    def render(self):
+        """
+        Paint the changes since the last render: released tail cells, new
+        heads, and the food and score if they changed. The game loop may
+        run several updates per render; cost grows with those, not with
+        the snake's length.
+        """
+        snake = self.snake
+        for cell in snake.vacated_cells():
+            self._erase_cell(cell)
+        for cell in snake.new_heads():
+            self._fill_cell(cell, COLOR_SNAKE)
+        snake.advanced = 0
+        snake.vacated = 0
+        self.render_hud()
+
+    def render_hud(self):
+        if self.food != self.drawn_food:
+            # The old food cell was eaten, so the head already covers it
+            if self.food is not None:
+                self._fill_cell(self.food, COLOR_FOOD)
+            self.drawn_food = self.food
+        if self.score != self.drawn_score:
+            fb.fill_rect(10, 10, 8 * 12, 8, COLOR_BG)
+            fb.text(f"Score: {self.score}", 10, 10, COLOR_TEXT)
+            self.drawn_score = self.score
 
         # Draw game over message
         if self.game_over:
             fb.text("GAME OVER", 100, 140, COLOR_GAME_OVER)
             fb.text("Press Q to quit", 80, 160, COLOR_TEXT)
 
+    def _fill_cell(self, cell, color):
+        x, y = cell_xy(cell)
+        fb.fill_rect(x * GRID_SIZE, y * GRID_SIZE + OFFSET_Y, GRID_SIZE - 1, GRID_SIZE - 1, color)
+
+    def _erase_cell(self, cell):
+        # Clear a cell, then put back any wall pixels it covered
+        x, y = cell_xy(cell)
+        px = x * GRID_SIZE
+        py = y * GRID_SIZE + OFFSET_Y
+        fb.fill_rect(px, py, GRID_SIZE - 1, GRID_SIZE - 1, COLOR_BG)
+        for wx, wy, ww, wh in WALLS:
+            left = max(px, wx)
+            top = max(py, wy)
+            right = min(px + GRID_SIZE - 1, wx + ww)
+            bottom = min(py + GRID_SIZE - 1, wy + wh)
+            if left < right and top < bottom:
+                fb.fill_rect(left, top, right - left, bottom - top, WALL_COLOR)
+
 def main():
     game = Game()
     temp = bytearray(1)
@@ -147,19 +264,15 @@ def main():
     while not keyboard.readinto(temp):
         pass
     
-    # Game loop
-    last_update = time.ticks_ms()
-    update_interval = 150  # Move every 150ms
-    
-    running = True
-    while running:
-        current_time = time.ticks_ms()
-        
-        # Handle input (non-blocking)
-        if keyboard.readinto(temp):
+    # Game loop: one snake move per step, faster as the score rises
+    game.draw()
+    loop = GameLoop(150)
+
+    def poll():
+        while keyboard.readinto(temp):
             key = temp[0]
             if key in (ord('q'), ord('Q')):
-                running = False
+                return False
             elif key == 65:  # Up
                 game.snake.set_direction((0, -1))
             elif key == 66:  # Down
@@ -168,29 +281,26 @@ def main():
                 game.snake.set_direction((1, 0))
             elif key == 68:  # Left
                 game.snake.set_direction((-1, 0))
-        
-        # Update game at fixed interval
-        if time.ticks_diff(current_time, last_update) >= update_interval:
-            game.update()
-            game.draw()
-            last_update = current_time
-            
-            # Speed up as score increases
-            update_interval = max(80, 150 - (game.score // 50) * 10)
-        
-        # If game over, wait for quit
-        if game.game_over:
-            game.draw()
-            time.sleep(1)
-            while running:
-                if keyboard.readinto(temp):
-                    key = temp[0]
-                    if key in (ord('q'), ord('Q')):
-                        running = False
-                        break
-                time.sleep_ms(50)
-        
-        time.sleep_ms(10)
+        return True
+
+    def update():
+        game.update()
+        # Speed up as score increases
+        loop.step_ms = max(80, 150 - (game.score // 50) * 10)
+        return not game.game_over
+
+    loop.run(update, lambda alpha: game.render(), poll)
+
+    # If game over, wait for quit
+    if game.game_over:
+        game.draw()
+        time.sleep(1)
+        while True:
+            if keyboard.readinto(temp):
+                key = temp[0]
+                if key in (ord('q'), ord('Q')):
+                    break
+            time.sleep_ms(50)
     
     # Exit screen
     fb.fill(COLOR_BG)
@@ -1,6 +1,7 @@
 # sudoku.py - Sudoku game for PicoCalc
 import time
 import random
+import struct
 from ui import *
 from battery import get_status as get_battery_status
 
@@ -10,7 +11,528 @@ def shuffle(lst):
         j = random.randint(0, i)
         lst[i], lst[j] = lst[j], lst[i]
 
+# ============ Bitmask Solver ============
+# Cells are indexed 0..80 row-major. Digit d is bit (d - 1) in a 9-bit mask.
+ALL_DIGITS = 0x1FF
+ROW_OF = bytes(i // 9 for i in range(81))
+COL_OF = bytes(i % 9 for i in range(81))
+BOX_OF = bytes((i // 27) * 3 + (i % 9) // 3 for i in range(81))
+UNITS = tuple(
+    [tuple(r * 9 + c for c in range(9)) for r in range(9)] +
+    [tuple(r * 9 + c for r in range(9)) for c in range(9)] +
+    [tuple((b // 3) * 27 + (b % 3) * 3 + (k // 3) * 9 + k % 3 for k in range(9))
+     for b in range(9)]
+)
+POPCOUNT = bytes(bin(m).count('1') for m in range(512))
+
+def _digit_table():
+    """DIGIT_OF[mask] is the digit if mask has a single bit set, else 0."""
+    table = bytearray(512)
+    for d in range(9):
+        table[1 << d] = d + 1
+    return bytes(table)
+
+DIGIT_OF = _digit_table()
+
+SOLVED = -1
+CONTRADICTION = -2
+
+class _Board:
+    """Flat grid plus used-digit masks for every row, column and box."""
+    def __init__(self, cells=None):
+        self.cells = bytearray(81)
+        self.rows = [0] * 9
+        self.cols = [0] * 9
+        self.boxes = [0] * 9
+        self.ok = True
+        if cells:
+            for i in range(81):
+                if cells[i]:
+                    if not self.candidates(i) & (1 << (cells[i] - 1)):
+                        self.ok = False
+                    self.place(i, cells[i])
+
+    def copy(self):
+        b = _Board()
+        b.cells[:] = self.cells
+        b.rows[:] = self.rows
+        b.cols[:] = self.cols
+        b.boxes[:] = self.boxes
+        return b
+
+    def candidates(self, i):
+        return ALL_DIGITS & ~(self.rows[ROW_OF[i]] | self.cols[COL_OF[i]] | self.boxes[BOX_OF[i]])
+
+    def place(self, i, d):
+        bit = 1 << (d - 1)
+        self.cells[i] = d
+        self.rows[ROW_OF[i]] |= bit
+        self.cols[COL_OF[i]] |= bit
+        self.boxes[BOX_OF[i]] |= bit
+
+    def propagate(self):
+        """
+        Fill naked and hidden singles until neither applies.
+
+        Returns SOLVED, CONTRADICTION, or the index of the empty cell with
+        the fewest candidates to branch on next.
+        """
+        cells = self.cells
+        rows = self.rows
+        cols = self.cols
+        boxes = self.boxes
+        while True:
+            # Naked singles, tracking the minimum-remaining-values cell
+            progress = False
+            best = SOLVED
+            best_n = 10
+            for i in range(81):
+                if cells[i]:
+                    continue
+                m = ALL_DIGITS & ~(rows[ROW_OF[i]] | cols[COL_OF[i]] | boxes[BOX_OF[i]])
+                n = POPCOUNT[m]
+                if n == 0:
+                    return CONTRADICTION
+                if n == 1:
+                    self.place(i, DIGIT_OF[m])
+                    progress = True
+                elif n < best_n:
+                    best = i
+                    best_n = n
+            if progress:
+                continue
+            if best == SOLVED:
+                return SOLVED
+            # Hidden singles: a digit with only one possible cell in a unit
+            for unit in UNITS:
+                once = 0
+                more = 0
+                placed = 0
+                for i in unit:
+                    d = cells[i]
+                    if d:
+                        placed |= 1 << (d - 1)
+                    else:
+                        m = ALL_DIGITS & ~(rows[ROW_OF[i]] | cols[COL_OF[i]] | boxes[BOX_OF[i]])
+                        more |= once & m
+                        once |= m
+                if (placed | once) != ALL_DIGITS:
+                    return CONTRADICTION
+                once &= ~more
+                if not once:
+                    continue
+                for i in unit:
+                    if cells[i]:
+                        continue
+                    m = once & ~(rows[ROW_OF[i]] | cols[COL_OF[i]] | boxes[BOX_OF[i]])
+                    if m:
+                        if POPCOUNT[m] > 1:
+                            return CONTRADICTION
+                        self.place(i, DIGIT_OF[m])
+                        progress = True
+            if not progress:
+                return best
+
+def solve(cells, limit=1, randomize=False):
+    """
+    Count solutions of an 81-cell puzzle (0 = empty), stopping at limit.
+
+    Uses candidate bitmasks with singles propagation and branches on the
+    cell with the fewest candidates, on an explicit stack (no recursion).
+    Returns (count, first solution as bytearray or None).
+    """
+    board = _Board(cells)
+    if not board.ok:
+        return 0, None
+    stack = [board]
+    count = 0
+    solution = None
+    while stack:
+        board = stack.pop()
+        i = board.propagate()
+        if i == CONTRADICTION:
+            continue
+        if i == SOLVED:
+            count += 1
+            if solution is None:
+                solution = board.cells
+            if count >= limit:
+                break
+            continue
+        m = board.candidates(i)
+        digits = [d for d in range(1, 10) if m & (1 << (d - 1))]
+        if randomize:
+            shuffle(digits)
+        for d in digits:
+            child = board.copy()
+            child.place(i, d)
+            stack.append(child)
+    return count, solution
+
+def has_unique_solution(cells):
+    return solve(cells, limit=2)[0] == 1
+
+def _removable(puzzle, i, d):
+    """
+    True if clearing cell i (whose solution digit is d) keeps the solution
+    unique, i.e. no other digit at i still leads to a solution.
+    """
+    board = _Board(puzzle)
+    others = board.candidates(i) & ~(1 << (d - 1))
+    for alt in range(1, 10):
+        if others & (1 << (alt - 1)):
+            puzzle[i] = alt
+            found = solve(puzzle)[0]
+            puzzle[i] = 0
+            if found:
+                return False
+    return True
+
+def generate(num_clues):
+    """
+    Generate (puzzle, solution) with a unique solution.
+
+    Clues are removed in random order and put back whenever removal would
+    allow a second solution, so the result may keep a few more clues than
+    requested when no further cell can go.
+    """
+    seed = bytearray(81)
+    # Seed the three independent diagonal boxes, then complete the grid
+    for box in range(0, 9, 3):
+        nums = list(range(1, 10))
+        shuffle(nums)
+        for k in range(9):
+            seed[(box + k // 3) * 9 + box + k % 3] = nums[k]
+    solution = solve(seed, randomize=True)[1]
+    puzzle = bytearray(solution)
+    order = list(range(81))
+    shuffle(order)
+    clues = 81
+    for i in order:
+        if clues <= num_clues:
+            break
+        d = puzzle[i]
+        puzzle[i] = 0
+        if _removable(puzzle, i, d):
+            clues -= 1
+        else:
+            puzzle[i] = d
+    return puzzle, solution
+
+# ============ Grading ============
+GRADES = ("easy", "medium", "hard")
+PEERS = tuple(
+    tuple(sorted(set(j for u in UNITS if i in u for j in u) - {i}))
+    for i in range(81)
+)
+
+def _fill(cells, cand, i, d):
+    bit = 1 << (d - 1)
+    cells[i] = d
+    cand[i] = 0
+    for p in PEERS[i]:
+        cand[p] &= ~bit
+
+def _naked_singles(cells, cand):
+    found = 0
+    for i in range(81):
+        if not cells[i] and POPCOUNT[cand[i]] == 1:
+            _fill(cells, cand, i, DIGIT_OF[cand[i]])
+            found += 1
+    return found
+
+def _hidden_singles(cells, cand):
+    found = 0
+    for unit in UNITS:
+        once = 0
+        more = 0
+        for i in unit:
+            more |= once & cand[i]
+            once |= cand[i]
+        once &= ~more
+        if once:
+            for i in unit:
+                m = cand[i] & once
+                if m and POPCOUNT[m] == 1:
+                    _fill(cells, cand, i, DIGIT_OF[m])
+                    found += 1
+    return found
+
+def _eliminate(cand, targets, keep, mask):
+    """Remove mask from every cell in targets outside keep."""
+    changed = False
+    for i in targets:
+        if i not in keep and cand[i] & mask:
+            cand[i] &= ~mask
+            changed = True
+    return changed
+
+def _locked_candidates(cand):
+    """Pointing and claiming: a digit confined to a box/line intersection."""
+    changed = False
+    for unit in UNITS:
+        for d in range(9):
+            bit = 1 << d
+            where = [i for i in unit if cand[i] & bit]
+            if len(where) < 2:
+                continue
+            r = ROW_OF[where[0]]
+            c = COL_OF[where[0]]
+            b = BOX_OF[where[0]]
+            if all(ROW_OF[i] == r for i in where):
+                changed |= _eliminate(cand, UNITS[r], where, bit)
+            if all(COL_OF[i] == c for i in where):
+                changed |= _eliminate(cand, UNITS[9 + c], where, bit)
+            if all(BOX_OF[i] == b for i in where):
+                changed |= _eliminate(cand, UNITS[18 + b], where, bit)
+    return changed
+
+def _naked_pairs(cand):
+    changed = False
+    for unit in UNITS:
+        pairs = [i for i in unit if POPCOUNT[cand[i]] == 2]
+        for k in range(len(pairs)):
+            for j in range(k + 1, len(pairs)):
+                a = pairs[k]
+                b = pairs[j]
+                if cand[a] == cand[b]:
+                    changed |= _eliminate(cand, unit, (a, b), cand[a])
+    return changed
+
+def grade(puzzle):
+    """
+    Grade a puzzle by the techniques a human solver would need.
+
+    Returns (grade, score). "easy" needs only naked and hidden singles,
+    "medium" also needs locked candidates or naked pairs, and "hard"
+    needs trial and error. The score adds a weight per deduction so
+    puzzles within a grade can be compared.
+    """
+    cells = bytearray(puzzle)
+    cand = [0 if d else ALL_DIGITS for d in cells]
+    for i in range(81):
+        if cells[i]:
+            _fill(cells, cand, i, cells[i])
+    level = 0
+    score = 0
+    while 0 in cells:
+        n = _naked_singles(cells, cand)
+        if n:
+            score += n
+            continue
+        n = _hidden_singles(cells, cand)
+        if n:
+            score += 2 * n
+            continue
+        if _locked_candidates(cand):
+            level = 1
+            score += 5
+            continue
+        if _naked_pairs(cand):
+            level = 1
+            score += 8
+            continue
+        level = 2
+        score += 20 * cells.count(0)
+        break
+    return GRADES[level], score
+
+def next_step(cells, cand):
+    """
+    Find the next logical placement as (cell, digit, technique).
+
+    Singles are tried first; when none exist, locked candidates and naked
+    pairs are applied to cand (eliminations only) and singles retried.
+    Returns None if these techniques are stuck.
+    """
+    while True:
+        for i in range(81):
+            if not cells[i] and POPCOUNT[cand[i]] == 1:
+                return i, DIGIT_OF[cand[i]], "Naked single"
+        for unit in UNITS:
+            once = 0
+            more = 0
+            for i in unit:
+                more |= once & cand[i]
+                once |= cand[i]
+            once &= ~more
+            if once:
+                for i in unit:
+                    m = cand[i] & once
+                    if m:
+                        return i, DIGIT_OF[m & -m], "Hidden single"
+        if not (_locked_candidates(cand) or _naked_pairs(cand)):
+            return None
+
+# ============ Puzzle Bank ============
+# Fixed-size file on /sd: header (magic + puzzle count per grade), then one
+# section of BANK_CAPACITY records per grade. A record is 81 packed nibbles,
+# so loading a puzzle is one seek and one 41-byte read.
+BANK_PATH = "/sd/sudoku.bank"
+BANK_MAGIC = b"SDK1"
+BANK_CAPACITY = 200
+BANK_HEADER = "<4s" + "H" * len(GRADES)
+HEADER_SIZE = struct.calcsize(BANK_HEADER)
+RECORD_SIZE = 41
+BANK_CLUES = {"easy": 36, "medium": 26, "hard": 24}
+
+def pack_puzzle(cells):
+    data = bytearray(RECORD_SIZE)
+    for i in range(81):
+        data[i >> 1] |= cells[i] << (0 if i & 1 else 4)
+    return data
+
+def unpack_puzzle(data):
+    cells = bytearray(81)
+    for i in range(81):
+        cells[i] = (data[i >> 1] >> (0 if i & 1 else 4)) & 0xF
+    return cells
+
+class PuzzleBank:
+    """Graded puzzles stored on the SD card."""
+    def __init__(self, path=BANK_PATH, capacity=BANK_CAPACITY):
+        self.path = path
+        self.capacity = capacity
+        self.counts = [0] * len(GRADES)
+        self.lock = None
+        self.filling = False
+        self.stopping = False
+
+    def open(self):
+        """Read the index, creating an empty bank file if needed."""
+        try:
+            with open(self.path, "rb") as f:
+                fields = struct.unpack(BANK_HEADER, f.read(HEADER_SIZE))
+            if fields[0] == BANK_MAGIC:
+                self.counts = [min(n, self.capacity) for n in fields[1:]]
+                return
+        except (OSError, ValueError):
+            pass
+        self.counts = [0] * len(GRADES)
+        blank = bytes(RECORD_SIZE * 25)
+        with open(self.path, "wb") as f:
+            f.write(struct.pack(BANK_HEADER, BANK_MAGIC, *self.counts))
+            total = RECORD_SIZE * self.capacity * len(GRADES)
+            while total > 0:
+                f.write(blank[:total])
+                total -= len(blank)
+
+    def _offset(self, g, k):
+        return HEADER_SIZE + (g * self.capacity + k) * RECORD_SIZE
+
+    def random_puzzle(self, difficulty):
+        """A random stored puzzle of the given grade, or None if none yet."""
+        g = GRADES.index(difficulty)
+        if not self.counts[g]:
+            return None
+        if self.lock:
+            self.lock.acquire()
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset(g, random.randint(0, self.counts[g] - 1)))
+                return unpack_puzzle(f.read(RECORD_SIZE))
+        finally:
+            if self.lock:
+                self.lock.release()
+
+    def add(self, puzzle, difficulty):
+        """Store a puzzle in its grade section. False if that section is full."""
+        g = GRADES.index(difficulty)
+        k = self.counts[g]
+        if k >= self.capacity:
+            return False
+        if self.lock:
+            self.lock.acquire()
+        try:
+            with open(self.path, "r+b") as f:
+                f.seek(self._offset(g, k))
+                f.write(pack_puzzle(puzzle))
+                self.counts[g] = k + 1
+                f.seek(0)
+                f.write(struct.pack(BANK_HEADER, BANK_MAGIC, *self.counts))
+        finally:
+            if self.lock:
+                self.lock.release()
+        return True
+
+    def neediest(self):
+        """Grade with the fewest stored puzzles, or None when all are full."""
+        n = min(self.counts)
+        if n >= self.capacity:
+            return None
+        return GRADES[self.counts.index(n)]
+
+    def top_up(self):
+        """Generate one puzzle aimed at the neediest grade and file it by its
+        actual grade. Returns False once the bank is full."""
+        target = self.neediest()
+        if target is None:
+            return False
+        puzzle = generate(BANK_CLUES[target])[0]
+        self.add(puzzle, grade(puzzle)[0])
+        return True
+
+_bank = None
+
+def open_bank():
+    """The shared puzzle bank, or None if the SD card can't be used."""
+    global _bank
+    if _bank is None:
+        bank = PuzzleBank()
+        try:
+            bank.open()
+        except OSError:
+            return None
+        _bank = bank
+    return _bank
+
+def _fill_bank(bank):
+    try:
+        while not bank.stopping and bank.top_up():
+            pass
+    finally:
+        bank.filling = False
+
+def start_bank_filler(bank):
+    """
+    Top up the bank on the second core while the player plays.
+
+    Returns False on builds without _thread or when the core is busy.
+    """
+    bank.stopping = False
+    if bank.filling:
+        return True
+    try:
+        import _thread
+    except ImportError:
+        return False
+    if bank.lock is None:
+        bank.lock = _thread.allocate_lock()
+    bank.filling = True
+    try:
+        _thread.start_new_thread(_fill_bank, (bank,))
+    except OSError:
+        bank.filling = False
+        return False
+    return True
+
+def stop_bank_filler(bank):
+    """
+    Stop the filler and wait for it to exit, so it never touches the SD
+    card after the game has handed control back to the menu.
+    """
+    bank.stopping = True
+    while bank.filling:
+        time.sleep(0.01)
+
 class SudokuGame:
+    """
+    Board state with live candidate tracking.
+
+    For each row, column and box the game keeps a count of every digit.
+    Entering or clearing a digit updates three counters. Candidates,
+    conflicts and completion are then read in O(1), with no board rescan.
+    """
     def __init__(self, difficulty="medium"):
         self.grid = [[0 for _ in range(9)] for _ in range(9)]
         self.given = [[False for _ in range(9)] for _ in range(9)]
@@ -19,270 +541,222 @@ class SudokuGame:
         self.difficulty = difficulty
         self.start_time = time.time()
         self.completed = False
+        self.solution = None
+        self.pencil = False        # Show candidate pencil marks
+        self.counts = bytearray(27 * 9)  # Per unit, per digit
+        self.used = [0] * 27       # Per unit, mask of digits present
+        self.filled = 0
+        self.dups = 0              # (unit, digit) pairs appearing twice or more
         
-    def generate_puzzle(self):
-        """Generate a new Sudoku puzzle."""
-        # Try up to 3 times to generate a valid puzzle
-        for attempt in range(3):
-            # Reset grid
-            self.grid = [[0 for _ in range(9)] for _ in range(9)]
-            
-            # First, generate a complete valid solution
-            self._fill_diagonal_boxes()
-            if not self._solve():
-                continue  # Retry if solve failed
-            
-            # Successfully generated, break out
-            break
-        
-        # Remove numbers based on difficulty
-        clues = {"easy": 40, "medium": 32, "hard": 26}
-        num_clues = clues.get(self.difficulty, 32)
-        cells_to_remove = 81 - num_clues
-        
-        # Randomly remove cells
-        removed = 0
-        attempts = 0
-        max_attempts = 200
-        
-        while removed < cells_to_remove and attempts < max_attempts:
-            row = random.randint(0, 8)
-            col = random.randint(0, 8)
-            
-            if self.grid[row][col] != 0:
-                backup = self.grid[row][col]
-                self.grid[row][col] = 0
-                
-                # Simple check: just remove it (proper unique solution check is complex)
-                removed += 1
-            
-            attempts += 1
-        
-        # Mark given cells
-        for r in range(9):
-            for c in range(9):
-                if self.grid[r][c] != 0:
-                    self.given[r][c] = True
-    
-    def _fill_diagonal_boxes(self):
-        """Fill the three diagonal 3x3 boxes with random valid numbers."""
-        for box in range(0, 9, 3):
-            nums = list(range(1, 10))
-            shuffle(nums)
-            idx = 0
-            for r in range(3):
-                for c in range(3):
-                    self.grid[box + r][box + c] = nums[idx]
-                    idx += 1
-    
-    def _solve(self):
-        """Solve the Sudoku using iterative backtracking (no recursion)."""
-        # Find all empty cells
-        empty_cells = []
-        for r in range(9):
-            for c in range(9):
-                if self.grid[r][c] == 0:
-                    empty_cells.append((r, c))
-        
-        if not empty_cells:
-            return True
-        
-        # Iterative backtracking using a stack
-        cell_idx = 0
-        attempts = [0] * len(empty_cells)  # Track which number we're trying for each cell
-        
-        while 0 <= cell_idx < len(empty_cells):
-            row, col = empty_cells[cell_idx]
-            
-            # Clear current cell
-            self.grid[row][col] = 0
-            
-            # Try numbers from attempts[cell_idx] + 1 to 9
-            found = False
-            for num in range(attempts[cell_idx] + 1, 10):
-                if self._is_valid(row, col, num):
-                    self.grid[row][col] = num
-                    attempts[cell_idx] = num
-                    found = True
-                    break
-            
-            if found:
-                # Move to next cell
-                cell_idx += 1
-            else:
-                # Backtrack
-                attempts[cell_idx] = 0
-                cell_idx -= 1
-                
-                # Safety check - if we backtracked too far, give up
-                if cell_idx < 0:
-                    return False
-        
-        return True
-    
-    def _find_empty(self):
-        """Find an empty cell (0)."""
+    def load(self, puzzle, solution=None):
+        """Set up the board from a flat 81-cell puzzle."""
+        if solution is None:
+            solution = solve(puzzle)[1]
+        self.solution = solution
+        self.counts = bytearray(27 * 9)
+        self.used = [0] * 27
+        self.filled = 0
+        self.dups = 0
         for r in range(9):
             for c in range(9):
-                if self.grid[r][c] == 0:
-                    return (r, c)
-        return None
-    
-    def _is_valid(self, row, col, num):
-        """Check if placing num at (row, col) is valid."""
-        # Check row
-        if num in self.grid[row]:
+                self.grid[r][c] = 0
+                self.given[r][c] = puzzle[r * 9 + c] != 0
+                if puzzle[r * 9 + c]:
+                    self._put(r, c, puzzle[r * 9 + c])
+
+    def _put(self, row, col, num):
+        """Write num (0 clears) and update the unit counters."""
+        old = self.grid[row][col]
+        if old == num:
+            return
+        i = row * 9 + col
+        units = (ROW_OF[i], 9 + COL_OF[i], 18 + BOX_OF[i])
+        if old:
+            bit = 1 << (old - 1)
+            self.filled -= 1
+            for u in units:
+                k = u * 9 + old - 1
+                self.counts[k] -= 1
+                n = self.counts[k]
+                if n == 1:
+                    self.dups -= 1
+                elif n == 0:
+                    self.used[u] &= ~bit
+        if num:
+            bit = 1 << (num - 1)
+            self.filled += 1
+            for u in units:
+                k = u * 9 + num - 1
+                self.counts[k] += 1
+                n = self.counts[k]
+                if n == 2:
+                    self.dups += 1
+                elif n == 1:
+                    self.used[u] |= bit
+        self.grid[row][col] = num
+
+    def candidates(self, row, col):
+        """Mask of digits not yet used in the cell's row, column or box."""
+        i = row * 9 + col
+        used = self.used
+        return ALL_DIGITS & ~(used[ROW_OF[i]] | used[9 + COL_OF[i]] | used[18 + BOX_OF[i]])
+
+    def is_conflict(self, row, col):
+        """True if the cell's digit also appears in its row, column or box."""
+        num = self.grid[row][col]
+        if not num:
             return False
-        
-        # Check column
-        for r in range(9):
-            if self.grid[r][col] == num:
-                return False
-        
-        # Check 3x3 box
-        box_row, box_col = 3 * (row // 3), 3 * (col // 3)
-        for r in range(box_row, box_row + 3):
-            for c in range(box_col, box_col + 3):
-                if self.grid[r][c] == num:
-                    return False
-        
-        return True
-    
+        i = row * 9 + col
+        counts = self.counts
+        return (counts[ROW_OF[i] * 9 + num - 1] > 1 or
+                counts[(9 + COL_OF[i]) * 9 + num - 1] > 1 or
+                counts[(18 + BOX_OF[i]) * 9 + num - 1] > 1)
+
     def get_conflicts(self, row, col):
         """Get list of conflicting cells for the cell at (row, col)."""
-        if self.grid[row][col] == 0:
-            return []
-        
         num = self.grid[row][col]
-        conflicts = []
-        
-        # Check row
-        for c in range(9):
-            if c != col and self.grid[row][c] == num:
-                conflicts.append((row, c))
-        
-        # Check column
-        for r in range(9):
-            if r != row and self.grid[r][col] == num:
-                conflicts.append((r, col))
-        
-        # Check 3x3 box
-        box_row, box_col = 3 * (row // 3), 3 * (col // 3)
-        for r in range(box_row, box_row + 3):
-            for c in range(box_col, box_col + 3):
-                if (r, c) != (row, col) and self.grid[r][c] == num:
-                    conflicts.append((r, c))
-        
-        return conflicts
+        if not self.is_conflict(row, col):
+            return []
+        return [(p // 9, p % 9) for p in PEERS[row * 9 + col]
+                if self.grid[p // 9][p % 9] == num]
     
     def is_complete(self):
         """Check if puzzle is complete and valid."""
-        for r in range(9):
-            for c in range(9):
-                if self.grid[r][c] == 0:
-                    return False
-                if self.get_conflicts(r, c):
-                    return False
-        return True
+        return self.filled == 81 and self.dups == 0
     
     def set_cell(self, row, col, num):
-        """Set a cell value if it's not a given cell."""
-        if not self.given[row][col]:
-            self.grid[row][col] = num
+        """
+        Set a cell value if it's not a given cell.
 
-def draw_sudoku(game):
-    """Draw the Sudoku grid and numbers."""
-    clear()
-    
-    # Grid parameters - centered on screen
-    grid_size = 315
-    cell_size = 35
-    grid_x = 2
-    grid_y = 2  # Start at top of screen
-    
-    # Draw grid lines
-    for i in range(10):
-        thickness = 2 if i % 3 == 0 else 1
-        color = COLOR_WHITE
-        
-        # Vertical lines
-        x = grid_x + i * cell_size
-        for t in range(thickness):
-            fb.vline(x + t, grid_y, grid_size, color)
-        
-        # Horizontal lines
-        y = grid_y + i * cell_size
-        for t in range(thickness):
-            fb.hline(grid_x, y + t, grid_size, color)
-    
-    # Highlight selected cell's row, column, and box
-    sel_row, sel_col = game.cursor_row, game.cursor_col
-    
-    # Highlight row
-    y = grid_y + sel_row * cell_size + 1
-    fb.fill_rect(grid_x + 1, y, grid_size - 2, cell_size - 1, COLOR_BLUE)
-    
-    # Highlight column
-    x = grid_x + sel_col * cell_size + 1
-    fb.fill_rect(x, grid_y + 1, cell_size - 1, grid_size - 2, COLOR_BLUE)
-    
-    # Highlight 3x3 box
-    box_row, box_col = 3 * (sel_row // 3), 3 * (sel_col // 3)
-    bx = grid_x + box_col * cell_size + 1
-    by = grid_y + box_row * cell_size + 1
-    fb.fill_rect(bx, by, 3 * cell_size - 1, 3 * cell_size - 1, COLOR_BLUE)
-    
-    # Redraw grid lines over highlights
+        Returns the cells (flat indices) whose display may have changed:
+        the cell and its row, column and box peers.
+        """
+        if self.given[row][col] or self.grid[row][col] == num:
+            return []
+        self._put(row, col, num)
+        i = row * 9 + col
+        return [i] + list(PEERS[i])
+
+    def hint(self):
+        """
+        Next step as (row, col, digit, reason).
+
+        A wrong entry is pointed out first (digit 0). Otherwise the next
+        logical deduction is returned, falling back to the solution for
+        the empty cell with the fewest candidates.
+        """
+        cells = bytearray(81)
+        for r in range(9):
+            for c in range(9):
+                num = self.grid[r][c]
+                if num and self.solution and num != self.solution[r * 9 + c]:
+                    return r, c, 0, "Wrong digit"
+                cells[r * 9 + c] = num
+        cand = [0 if cells[i] else self.candidates(i // 9, i % 9) for i in range(81)]
+        step = next_step(cells, cand)
+        if step:
+            i, d, reason = step
+            return i // 9, i % 9, d, reason
+        if not self.solution:
+            return None
+        best = None
+        for i in range(81):
+            if not cells[i] and (best is None or POPCOUNT[cand[i]] < POPCOUNT[cand[best]]):
+                best = i
+        if best is None:
+            return None
+        return best // 9, best % 9, self.solution[best], "From solution"
+
+# Grid layout - fills the screen from the top
+GRID_SIZE = 315
+CELL_SIZE = 35
+GRID_X = 2
+GRID_Y = 2
+INFO_Y = GRID_Y + GRID_SIZE + 2
+
+def _draw_grid_lines():
     for i in range(10):
         thickness = 2 if i % 3 == 0 else 1
-        color = COLOR_WHITE
-        x = grid_x + i * cell_size
+        x = GRID_X + i * CELL_SIZE
+        y = GRID_Y + i * CELL_SIZE
         for t in range(thickness):
-            fb.vline(x + t, grid_y, grid_size, color)
-        y = grid_y + i * cell_size
-        for t in range(thickness):
-            fb.hline(grid_x, y + t, grid_size, color)
-    
-    # Draw numbers (with black background to ensure they're visible over highlights)
-    for r in range(9):
-        for c in range(9):
-            num = game.grid[r][c]
-            if num != 0:
-                x = grid_x + c * cell_size + 12
-                y = grid_y + r * cell_size + 12
-                
-                # Determine color
-                if game.given[r][c]:
-                    color = COLOR_WHITE  # Given numbers: light gray/white
-                elif game.get_conflicts(r, c):
-                    color = COLOR_RED  # Conflicts: red
-                else:
-                    color = COLOR_CYAN  # Player numbers: bright green (cyan is actually green on this display)
-                
-                # Draw with explicit black background to cover blue highlights
-                draw_text(str(num), x, y, color, COLOR_BLACK)
-    
-    # Highlight selected cell
-    x = grid_x + sel_col * cell_size
-    y = grid_y + sel_row * cell_size
-    draw_rect(x + 1, y + 1, cell_size - 2, cell_size - 2, COLOR_YELLOW, fill=False)
-    draw_rect(x + 2, y + 2, cell_size - 4, cell_size - 4, COLOR_YELLOW, fill=False)
-    
-    # Show info below grid
-    info_y = grid_y + grid_size + 2
-    
-    # Show timer and difficulty on one line
+            fb.vline(x + t, GRID_Y, GRID_SIZE, COLOR_WHITE)
+            fb.hline(GRID_X, y + t, GRID_SIZE, COLOR_WHITE)
+
+def _highlighted(game, r, c):
+    """True if (r, c) shares a row, column or box with the cursor."""
+    sr = game.cursor_row
+    sc = game.cursor_col
+    return r == sr or c == sc or (r // 3 == sr // 3 and c // 3 == sc // 3)
+
+def draw_cell(game, r, c, hint_digit=0):
+    """Repaint one cell inside its grid lines."""
+    # Cell interior starts after the (1 or 2 px) grid line
+    x0 = GRID_X + c * CELL_SIZE + (2 if c % 3 == 0 else 1)
+    y0 = GRID_Y + r * CELL_SIZE + (2 if r % 3 == 0 else 1)
+    x1 = GRID_X + (c + 1) * CELL_SIZE
+    y1 = GRID_Y + (r + 1) * CELL_SIZE
+    bg = COLOR_BLUE if _highlighted(game, r, c) else COLOR_BLACK
+    fb.fill_rect(x0, y0, x1 - x0, y1 - y0, bg)
+    x = GRID_X + c * CELL_SIZE
+    y = GRID_Y + r * CELL_SIZE
+    num = game.grid[r][c]
+    if num != 0:
+        # Determine color
+        if game.given[r][c]:
+            color = COLOR_WHITE  # Given numbers: light gray/white
+        elif game.is_conflict(r, c):
+            color = COLOR_RED  # Conflicts: red
+        else:
+            color = COLOR_CYAN  # Player numbers: bright green (cyan is actually green on this display)
+        # Draw with explicit black background to cover blue highlights
+        draw_text(str(num), x + 12, y + 12, color, COLOR_BLACK)
+    elif hint_digit:
+        draw_text(str(hint_digit), x + 12, y + 12, COLOR_YELLOW, COLOR_BLACK)
+    elif game.pencil:
+        # Auto pencil marks in a 3x3 layout
+        m = game.candidates(r, c)
+        for d in range(9):
+            if m & (1 << d):
+                draw_text(str(d + 1), x + 3 + (d % 3) * 11, y + 3 + (d // 3) * 11, COLOR_MAGENTA)
+    if r == game.cursor_row and c == game.cursor_col:
+        draw_rect(x + 1, y + 1, CELL_SIZE - 2, CELL_SIZE - 2, COLOR_YELLOW, fill=False)
+        draw_rect(x + 2, y + 2, CELL_SIZE - 4, CELL_SIZE - 4, COLOR_YELLOW, fill=False)
+
+def draw_cells(game, cells):
+    """Repaint only the given flat cell indices."""
+    for i in cells:
+        draw_cell(game, i // 9, i % 9)
+
+def cursor_cells(game):
+    """Flat indices of the cursor cell and everything it highlights."""
+    i = game.cursor_row * 9 + game.cursor_col
+    return [i] + list(PEERS[i])
+
+def draw_banner(message):
+    """Message across the bottom grid row; repaint row 8 to remove it."""
+    draw_text(message, GRID_X + 4, GRID_Y + GRID_SIZE - 11, COLOR_YELLOW, COLOR_BLACK)
+
+def draw_info(game):
+    """Timer and difficulty on the line below the grid."""
+    fb.fill_rect(0, INFO_Y, 320, 320 - INFO_Y, COLOR_BLACK)
     elapsed = int(time.time() - game.start_time)
     mins = elapsed // 60
     secs = elapsed % 60
     timer_text = f"{mins:02d}:{secs:02d}"
     diff_text = f"{game.difficulty[0].upper()}{game.difficulty[1:]}"
     
-    draw_text(diff_text, 4, info_y, COLOR_CYAN)  # Bright green
-    draw_text(timer_text, 280, info_y, COLOR_CYAN)  # Bright green
-    
-    # Help text (compact, no room for full text)
-    # Leave blank or minimal - players will learn controls
+    draw_text(diff_text, 4, INFO_Y, COLOR_CYAN)  # Bright green
+    draw_text(timer_text, 280, INFO_Y, COLOR_CYAN)  # Bright green
+
+def draw_sudoku(game):
+    """Draw the whole board. Later updates go through draw_cells."""
+    clear()
+    _draw_grid_lines()
+    for r in range(9):
+        for c in range(9):
+            draw_cell(game, r, c)
+    draw_info(game)
 
 def select_difficulty():
     """Show difficulty selection menu."""
@@ -322,49 +796,113 @@ def play_sudoku():
     center_text("Generating puzzle...", 140, COLOR_YELLOW)
     center_text("Please wait...", 160, COLOR_WHITE)
     
-    # Create and generate puzzle
-    game = SudokuGame(difficulty)
-    game.generate_puzzle()
+    # Take a puzzle of the requested grade from the bank if there is one
+    bank = open_bank()
+    puzzle = bank.random_puzzle(difficulty) if bank else None
+    actual = difficulty
+    if puzzle is None:
+        # Bank empty for this grade: generate until one grades right,
+        # keeping the closest grade if none does in a few tries
+        want = GRADES.index(difficulty)
+        best = None
+        for attempt in range(8):
+            candidate = generate(BANK_CLUES[difficulty])[0]
+            g = grade(candidate)[0]
+            if bank:
+                bank.add(candidate, g)
+            if best is None or abs(GRADES.index(g) - want) < abs(GRADES.index(actual) - want):
+                best = candidate
+                actual = g
+            if g == difficulty:
+                break
+        puzzle = best
+    game = SudokuGame(actual)
+    game.load(puzzle)
+    if bank:
+        start_bank_filler(bank)
     
-    # Game loop
-    running = True
-    while running:
-        draw_sudoku(game)
-        
-        # Check if completed
-        if game.is_complete() and not game.completed:
-            game.completed = True
-            elapsed = int(time.time() - game.start_time)
-            mins = elapsed // 60
-            secs = elapsed % 60
+    # Game loop: full draw once, then only the cells each key affects
+    draw_sudoku(game)
+    banner = actual != difficulty
+    if banner:
+        draw_banner(f"No {difficulty} puzzle yet, {actual}")
+    try:
+        running = True
+        while running:
+            # Check if completed
+            if game.is_complete() and not game.completed:
+                game.completed = True
+                elapsed = int(time.time() - game.start_time)
+                mins = elapsed // 60
+                secs = elapsed % 60
             
-            clear()
-            center_text("Congratulations!", 120, COLOR_GREEN)
-            center_text("Puzzle Complete!", 150, COLOR_GREEN)
-            center_text(f"Time: {mins:02d}:{secs:02d}", 180, COLOR_CYAN)
-            draw_text("Press any key to continue...", 8, 290, COLOR_YELLOW)
-            wait_key_raw()
-            return
+                clear()
+                center_text("Congratulations!", 120, COLOR_GREEN)
+                center_text("Puzzle Complete!", 150, COLOR_GREEN)
+                center_text(f"Time: {mins:02d}:{secs:02d}", 180, COLOR_CYAN)
+                draw_text("Press any key to continue...", 8, 290, COLOR_YELLOW)
+                wait_key_raw()
+                break
         
-        key = wait_key_raw()
+            key = wait_key_raw()
+            dirty = []
+            message = None
         
-        if key == 'A':  # Up
-            game.cursor_row = (game.cursor_row - 1) % 9
-        elif key == 'B':  # Down
-            game.cursor_row = (game.cursor_row + 1) % 9
-        elif key == 'D':  # Left
-            game.cursor_col = (game.cursor_col - 1) % 9
-        elif key == 'C':  # Right
-            game.cursor_col = (game.cursor_col + 1) % 9
-        elif key in '123456789':
-            num = int(key)
-            game.set_cell(game.cursor_row, game.cursor_col, num)
-        elif key in ('0', '\x7f', '\x08'):  # 0, delete, backspace
-            game.set_cell(game.cursor_row, game.cursor_col, 0)
-        elif key in ('q', 'Q'):
-            running = False
+            if key in ('A', 'B', 'C', 'D'):
+                # Cursor move: repaint the old and new highlight areas
+                dirty = cursor_cells(game)
+                if key == 'A':  # Up
+                    game.cursor_row = (game.cursor_row - 1) % 9
+                elif key == 'B':  # Down
+                    game.cursor_row = (game.cursor_row + 1) % 9
+                elif key == 'D':  # Left
+                    game.cursor_col = (game.cursor_col - 1) % 9
+                else:  # Right
+                    game.cursor_col = (game.cursor_col + 1) % 9
+                dirty = set(dirty)
+                dirty.update(cursor_cells(game))
+            elif key in '123456789':
+                num = int(key)
+                dirty = game.set_cell(game.cursor_row, game.cursor_col, num)
+            elif key in ('0', '\x7f', '\x08'):  # 0, delete, backspace
+                dirty = game.set_cell(game.cursor_row, game.cursor_col, 0)
+            elif key in ('p', 'P'):  # Toggle pencil marks
+                game.pencil = not game.pencil
+                dirty = [i for i in range(81) if not game.grid[i // 9][i % 9]]
+            elif key in ('h', 'H'):  # Hint
+                hint = game.hint()
+                if hint is None:
+                    message = "No hint available"
+                else:
+                    r, c, d, reason = hint
+                    dirty = set(cursor_cells(game))
+                    game.cursor_row = r
+                    game.cursor_col = c
+                    dirty.update(cursor_cells(game))
+                    dirty.discard(r * 9 + c)
+                    draw_cells(game, dirty)
+                    draw_cell(game, r, c, hint_digit=d)
+                    dirty = []
+                    message = f"{reason}: {d}" if d else reason
+            elif key in ('q', 'Q'):
+                running = False
         
-        time.sleep(0.01)
+            if banner:
+                dirty = set(dirty)
+                dirty.update(range(72, 81))
+            draw_cells(game, dirty)
+            draw_info(game)
+            banner = message is not None
+            if banner:
+                draw_banner(message)
+            time.sleep(0.01)
+    finally:
+        if bank:
+            if bank.filling:
+                clear()
+                center_text("Saving puzzle bank...", 150, COLOR_YELLOW)
+            stop_bank_filler(bank)
+
 
 if __name__ == "__main__":
     play_sudoku()
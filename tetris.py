@@ -2,7 +2,9 @@
 # MicroPython, 320x320 display
 import time
 import random
+import struct
 import ui
+from gameloop import GameLoop
 
 try:
     from picocalc import keyboard  # type: ignore
@@ -21,7 +23,23 @@ CELL_SIZE = 14  # Each cell is 14x14px
 GRID_X = 20     # Left margin
 GRID_Y = 10     # Top margin
 
-# Tetromino shapes (4x4 matrices)
+# Side panel layout
+HUD_X = 180     # Score/level/lines column
+HUD_Y = 120
+NEXT_X = 220    # Next piece preview
+NEXT_Y = 40
+HOLD_Y = 258    # Hold preview, same column as next
+
+GHOST = 8       # Added to a cell value to mark a ghost cell on screen
+
+# Game logic advances in fixed ticks so a seed plus the tick of each key
+# press reproduces a game exactly
+TICK_MS = 10
+REPLAY_PATH = "/sd/tetris.rep"
+REPLAY_MAGIC = b"TRP1"
+REPLAY_HEADER = "<4sIIIII"  # magic, seed, end tick, score, lines, pieces
+
+# Tetromino shapes in their spawn orientation
 TETROMINOES = [
     # I
     [[1, 1, 1, 1]],
@@ -51,53 +69,228 @@ TETROMINO_COLORS = [
     ui.COLOR_BROWN,         # L piece
 ]
 
+PIECE_I = 0
+PIECE_O = 1
+
+# SRS wall kicks as (dx, dy) with y pointing up, keyed by (from, to) rotation
+# state (0 = spawn, 1 = R, 2 = 180, 3 = L). Tried in order; first fit wins.
+KICKS_JLSTZ = {
+    (0, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (1, 0): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (1, 2): ((0, 0), (1, 0), (1, -1), (0, 2), (1, 2)),
+    (2, 1): ((0, 0), (-1, 0), (-1, 1), (0, -2), (-1, -2)),
+    (2, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+    (3, 2): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (3, 0): ((0, 0), (-1, 0), (-1, -1), (0, 2), (-1, 2)),
+    (0, 3): ((0, 0), (1, 0), (1, 1), (0, -2), (1, -2)),
+}
+KICKS_I = {
+    (0, 1): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (1, 0): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (1, 2): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+    (2, 1): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (2, 3): ((0, 0), (2, 0), (-1, 0), (2, 1), (-1, -2)),
+    (3, 2): ((0, 0), (-2, 0), (1, 0), (-2, -1), (1, 2)),
+    (3, 0): ((0, 0), (1, 0), (-2, 0), (1, -2), (-2, 1)),
+    (0, 3): ((0, 0), (-1, 0), (2, 0), (-1, 2), (2, -1)),
+}
+NO_KICKS = ((0, 0),)
+
+# Bitboard well: each row is an int with column c at bit (c + WALL). WALL
+# bits either side of the well are always set, so a piece shifted past an
+# edge collides without separate bounds checks.
+WALL = 4
+WALL_BITS = ((1 << WALL) - 1) | (((1 << WALL) - 1) << (WALL + GRID_W))
+EMPTY_ROW = WALL_BITS
+FULL_ROW = WALL_BITS | (((1 << GRID_W) - 1) << WALL)
+
+def _rotate(shape):
+    # Rotate a shape matrix 90 degrees clockwise
+    return [list(row) for row in zip(*shape[::-1])]
+
+def _box(shape):
+    # Pad a shape into its square SRS box (2x2 for O, 4x4 with the piece on
+    # the second row for I, 3x3 otherwise); rotating the whole box gives the
+    # SRS rotation states
+    size = len(shape[0])
+    top = 1 if size == 4 else 0
+    rows = [[0] * size for _ in range(top)] + [list(row) for row in shape]
+    return rows + [[0] * size for _ in range(size - len(rows))]
+
+def _build_pieces():
+    # PIECE_MASKS[piece][rot]: (row, mask) for each non-empty row of the box,
+    #   column 0 at bit 0
+    # PIECE_CELLS[piece][rot]: (col, row) offsets of the filled cells
+    # PIECE_BOTTOMS[piece][rot]: (col, lowest row) for each filled column
+    # PIECE_SIZE[piece]: box width, used to centre the spawn
+    masks = []
+    cells = []
+    bottoms = []
+    for shape in TETROMINOES:
+        shape = _box(shape)
+        rot_masks = []
+        rot_cells = []
+        rot_bottoms = []
+        for _ in range(4):
+            rot_masks.append(tuple((r, m) for r, m in
+                                   ((r, sum(1 << c for c, v in enumerate(row) if v)) for r, row in enumerate(shape))
+                                   if m))
+            filled = tuple((c, r) for r, row in enumerate(shape) for c, v in enumerate(row) if v)
+            rot_cells.append(filled)
+            rot_bottoms.append(tuple((c, max(r for cc, r in filled if cc == c))
+                                     for c in range(len(shape)) if any(cc == c for cc, _ in filled)))
+            shape = _rotate(shape)
+        masks.append(tuple(rot_masks))
+        cells.append(tuple(rot_cells))
+        bottoms.append(tuple(rot_bottoms))
+    return tuple(masks), tuple(cells), tuple(bottoms), tuple(len(s[0]) for s in TETROMINOES)
+
+PIECE_MASKS, PIECE_CELLS, PIECE_BOTTOMS, PIECE_SIZE = _build_pieces()
+
+def _put_varint(buf, n):
+    # Append n to buf, 7 bits per byte, high bit set on all but the last
+    while n >= 0x80:
+        buf.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buf.append(n)
+
+def decode_events(data):
+    """Turn replay event bytes (tick delta varint, key byte) into (tick, key) pairs."""
+    events = []
+    tick = 0
+    i = 0
+    while i < len(data):
+        delta = 0
+        shift = 0
+        while True:
+            b = data[i]
+            i += 1
+            delta |= (b & 0x7F) << shift
+            shift += 7
+            if not b & 0x80:
+                break
+        tick += delta
+        events.append((tick, data[i]))
+        i += 1
+    return events
+
+def load_replay(path=REPLAY_PATH):
+    """Read a replay file. Returns (seed, end tick, events, (score, lines, pieces))."""
+    with open(path, "rb") as f:
+        data = f.read()
+    size = struct.calcsize(REPLAY_HEADER)
+    magic, seed, end, score, lines, pieces = struct.unpack(REPLAY_HEADER, data[:size])
+    if magic != REPLAY_MAGIC:
+        raise ValueError("not a tetris replay")
+    return seed, end, decode_events(data[size:]), (score, lines, pieces)
+
 class Tetris:
-    def __init__(self):
-        self.grid = [[0 for _ in range(GRID_W)] for _ in range(GRID_H)]
+    def __init__(self, seed=None):
+        # Everything random comes from this seed, so replays deal the same pieces
+        if seed is None:
+            seed = random.getrandbits(30)
+        self.seed = seed
+        random.seed(seed)
+        self.ticks = 0      # Logic ticks run so far
+        self.gravity = 0    # Ticks since the piece last fell
+        self.events = bytearray()  # Recorded input, see _put_varint
+        self.last_event = 0
+        self.rows = [EMPTY_ROW] * GRID_H  # Occupancy bitmasks, used for collision
+        self.colors = [bytearray(GRID_W) for _ in range(GRID_H)]  # Piece index + 1 per cell
+        self.tops = bytearray([GRID_H] * GRID_W)  # Highest filled row per column
         self.score = 0
         self.level = 1
         self.lines = 0
+        self.pieces = 0  # Pieces locked so far
         self.current = None
+        self.bag = []
         self.next = self._random_piece()
+        self.hold = None
+        self.can_hold = True
         self.x = 0
         self.y = 0
         self.rotation = 0
         self.game_over = False
-        self.drop_timer = time.ticks_ms()
         self.key_buffer = bytearray(1)
+        # Renderer state; draw() resets it
+        self.shadow = [bytearray(GRID_W) for _ in range(GRID_H)]
+        self.dirty_to = 0   # Rows above this may differ from the screen
+        self.drawn_piece = {}
+        self.drawn_next = None
+        self.drawn_hold = None
+        self.drawn_stats = None
+        self.drawn_key = None
         self.spawn_piece()
 
-    def spawn_piece(self):
-        self.current = self.next
-        self.next = self._random_piece()
-        self.x = GRID_W // 2 - 2
+    def spawn_piece(self, piece=None):
+        if piece is None:
+            piece = self.next
+            self.next = self._random_piece()
+        self.current = piece
+        self.x = (GRID_W - PIECE_SIZE[piece]) // 2
         self.y = 0
         self.rotation = 0
         if self.collision(self.x, self.y, self.rotation):
             self.game_over = True
 
-    def rotate(self):
-        new_rot = (self.rotation + 1) % 4
-        if not self.collision(self.x, self.y, new_rot):
-            self.rotation = new_rot
+    def hold_piece(self):
+        # Swap the falling piece into the hold slot, once per piece
+        if not self.can_hold or self.current is None:
             return
-        # Simple wall kicks: try shifting left/right if rotation collides
-        if not self.collision(self.x - 1, self.y, new_rot):
-            self.x -= 1
-            self.rotation = new_rot
-        elif not self.collision(self.x + 1, self.y, new_rot):
-            self.x += 1
-            self.rotation = new_rot
+        held = self.hold
+        self.hold = self.current
+        self.can_hold = False
+        self.spawn_piece(held)
+
+    def rotate(self, turn=1):
+        # turn is 1 for clockwise, -1 for counter-clockwise
+        new_rot = (self.rotation + turn) % 4
+        if self.current == PIECE_O:
+            kicks = NO_KICKS
+        elif self.current == PIECE_I:
+            kicks = KICKS_I[(self.rotation, new_rot)]
+        else:
+            kicks = KICKS_JLSTZ[(self.rotation, new_rot)]
+        for dx, dy in kicks:
+            # Kick tables use y up; the well uses y down
+            if not self.collision(self.x + dx, self.y - dy, new_rot):
+                self.x += dx
+                self.y -= dy
+                self.rotation = new_rot
+                return
 
     def move(self, dx):
         if not self.collision(self.x + dx, self.y, self.rotation):
             self.x += dx
 
     def drop(self):
-        while not self.collision(self.x, self.y + 1, self.rotation):
-            self.y += 1
+        self.y = self.landing_y()
         self.lock_piece()
 
+    def landing_y(self):
+        """
+        Row the falling piece would land on if dropped straight down.
+
+        While the piece is above the surface, each of its columns can fall
+        until its lowest cell sits on that column's top, so the answer
+        comes from the column heights. Under an overhang that doesn't
+        hold, and it steps down with collision checks instead.
+        """
+        if self.current is None:
+            return self.y
+        tops = self.tops
+        land = GRID_H
+        for c, bottom in PIECE_BOTTOMS[self.current][self.rotation]:
+            top = tops[self.x + c]
+            if top <= self.y + bottom:
+                y = self.y
+                while not self.collision(self.x, y + 1, self.rotation):
+                    y += 1
+                return y
+            if top - 1 - bottom < land:
+                land = top - 1 - bottom
+        return land
+
     def step(self):
         if not self.collision(self.x, self.y + 1, self.rotation):
             self.y += 1
@@ -107,58 +300,125 @@ class Tetris:
     def lock_piece(self):
         if self.current is None:
             return
-        shape = self.get_shape(self.current, self.rotation)
-        piece_index = self.current
-        for r, row in enumerate(shape):
-            for c, val in enumerate(row):
-                if val:
-                    gx = self.x + c
-                    gy = self.y + r
-                    if 0 <= gx < GRID_W and 0 <= gy < GRID_H:
-                        self.grid[gy][gx] = piece_index + 1
+        shift = self.x + WALL
+        for r, mask in PIECE_MASKS[self.current][self.rotation]:
+            gy = self.y + r
+            if 0 <= gy < GRID_H:
+                self.rows[gy] |= mask << shift
+        for c, r in PIECE_CELLS[self.current][self.rotation]:
+            gy = self.y + r
+            if 0 <= gy < GRID_H:
+                self.colors[gy][self.x + c] = self.current + 1
+                if gy < self.tops[self.x + c]:
+                    self.tops[self.x + c] = gy
+        self.can_hold = True
+        self.pieces += 1
+        # The locked cells, and any rows a clear shifts down, need checking
+        self.dirty_to = max(self.dirty_to, min(GRID_H, self.y + 4))
         self.clear_lines()
         self.spawn_piece()
 
     def clear_lines(self):
-        new_grid = [list(row) for row in self.grid if any(cell == 0 for cell in row)]
-        cleared = GRID_H - len(new_grid)
+        # Only the rows the piece just touched can have filled up
+        cleared = 0
+        for gy in range(min(GRID_H, self.y + 4) - 1, max(0, self.y) - 1, -1):
+            if self.rows[gy] == FULL_ROW:
+                # Deleting from the bottom up leaves the rows above in place
+                del self.rows[gy]
+                del self.colors[gy]
+                cleared += 1
         if cleared:
+            for _ in range(cleared):
+                self.rows.insert(0, EMPTY_ROW)
+                self.colors.insert(0, bytearray(GRID_W))
+            self._update_tops()
             self.score += [0, 40, 100, 300, 1200][cleared] * self.level
             self.lines += cleared
             self.level = 1 + self.lines // 10
-            for _ in range(cleared):
-                new_grid.insert(0, [0] * GRID_W)
-            self.grid = new_grid
 
     def collision(self, x, y, rot):
         if self.current is None:
             return False
-        shape = self.get_shape(self.current, rot)
-        for r, row in enumerate(shape):
-            for c, val in enumerate(row):
-                if val:
-                    gx = x + c
-                    gy = y + r
-                    if gx < 0 or gx >= GRID_W or gy >= GRID_H:
-                        return True
-                    if gy >= 0 and self.grid[gy][gx]:
-                        return True
+        shift = x + WALL
+        if shift < 0:
+            return True
+        rows = self.rows
+        for r, mask in PIECE_MASKS[self.current][rot]:
+            gy = y + r
+            if gy >= GRID_H:
+                return True
+            if (rows[gy] if gy >= 0 else EMPTY_ROW) & (mask << shift):
+                return True
         return False
 
-    def get_shape(self, idx, rot):
-        shape = TETROMINOES[idx]
-        for _ in range(rot):
-            shape = [list(row) for row in zip(*shape[::-1])]
-        return shape
+    def _update_tops(self):
+        # Rescan column heights after rows have shifted
+        for c in range(GRID_W):
+            bit = 1 << (c + WALL)
+            top = GRID_H
+            for r in range(GRID_H):
+                if self.rows[r] & bit:
+                    top = r
+                    break
+            self.tops[c] = top
 
     def _random_piece(self):
-        return random.randint(0, len(TETROMINOES) - 1)
+        # 7-bag: deal each tetromino once, in shuffled order, per bag
+        if not self.bag:
+            bag = list(range(len(TETROMINOES)))
+            for i in range(len(bag) - 1, 0, -1):
+                j = random.randint(0, i)
+                bag[i], bag[j] = bag[j], bag[i]
+            self.bag = bag
+        return self.bag.pop()
 
     def _drop_interval(self):
         base = 700 - (self.level - 1) * 60
         return max(120, base)
 
+    def handle_key(self, key):
+        """Apply one game key and record it against the current tick."""
+        if self.game_over:
+            return
+        if key == 67:  # Right arrow
+            self.move(1)
+        elif key == 68:  # Left arrow
+            self.move(-1)
+        elif key == 65 or key in (ord('w'), ord('W'), ord('x'), ord('X')):  # Up / rotate
+            self.rotate()
+        elif key in (ord('z'), ord('Z')):  # Rotate counter-clockwise
+            self.rotate(-1)
+        elif key in (ord('c'), ord('h'), ord('H')):  # Hold ('C' is the right arrow code)
+            self.hold_piece()
+        elif key == 66:  # Down arrow: soft drop
+            self.step()
+            self.gravity = 0
+        elif key in (32, 13):  # Space or Enter for hard drop
+            self.drop()
+            self.gravity = 0
+        else:
+            return
+        _put_varint(self.events, self.ticks - self.last_event)
+        self.events.append(key)
+        self.last_event = self.ticks
+
+    def tick(self):
+        """Advance the game by one TICK_MS step of gravity."""
+        self.ticks += 1
+        self.gravity += 1
+        if self.gravity * TICK_MS >= self._drop_interval():
+            self.gravity = 0
+            self.step()
+
+    def save_replay(self, path=REPLAY_PATH):
+        """Write the seed, final state and recorded input to path."""
+        with open(path, "wb") as f:
+            f.write(struct.pack(REPLAY_HEADER, REPLAY_MAGIC, self.seed, self.ticks,
+                                self.score, self.lines, self.pieces))
+            f.write(self.events)
+
     def draw(self):
+        """Repaint the whole screen, then let render() fill in the cells."""
         ui.clear()
         # Well outline
         well_width = GRID_W * CELL_SIZE
@@ -166,26 +426,7 @@ class Tetris:
         ui.draw_rect(GRID_X - 2, GRID_Y - 2, well_width + 4, well_height + 4, ui.COLOR_WHITE, fill=False)
         # Grid background
         ui.draw_rect(GRID_X, GRID_Y, well_width, well_height, ui.COLOR_BLACK, fill=True)
-        # Draw grid
-        for r in range(GRID_H):
-            for c in range(GRID_W):
-                val = self.grid[r][c]
-                if val:
-                    color = TETROMINO_COLORS[(val - 1) % len(TETROMINO_COLORS)]
-                    x = GRID_X + c * CELL_SIZE
-                    y = GRID_Y + r * CELL_SIZE
-                    ui.draw_rect(x, y, CELL_SIZE, CELL_SIZE, color, fill=True)
-        # Draw current piece
-        if self.current is not None:
-            shape = self.get_shape(self.current, self.rotation)
-            color = TETROMINO_COLORS[self.current]
-            for r, row in enumerate(shape):
-                for c, val in enumerate(row):
-                    if val:
-                        x = GRID_X + (self.x + c) * CELL_SIZE
-                        y = GRID_Y + (self.y + r) * CELL_SIZE
-                        ui.draw_rect(x, y, CELL_SIZE, CELL_SIZE, color, fill=True)
-        # Grid lines (optional for clarity)
+        # Grid lines; cells are painted inside them so they never need redrawing
         grid_color = ui.COLOR_BLUE_GREEN
         for r in range(GRID_H + 1):
             y = GRID_Y + r * CELL_SIZE
@@ -193,88 +434,152 @@ class Tetris:
         for c in range(GRID_W + 1):
             x = GRID_X + c * CELL_SIZE
             ui.draw_rect(x, GRID_Y, 1, GRID_H * CELL_SIZE, grid_color, fill=True)
-        # Draw next piece preview
-        ui.draw_text("Next:", 180, 20, ui.COLOR_WHITE)
-        if self.next is not None:
-            next_shape = self.get_shape(self.next, 0)
-            next_color = TETROMINO_COLORS[self.next]
-            for r, row in enumerate(next_shape):
-                for c, val in enumerate(row):
-                    if val:
-                        x = 220 + c * CELL_SIZE
-                        y = 40 + r * CELL_SIZE
-                        ui.draw_rect(x, y, CELL_SIZE, CELL_SIZE, next_color, fill=True)
-        # Draw score/level
-        ui.draw_text(f"Score: {self.score}", 180, 120, ui.COLOR_WHITE)
-        ui.draw_text(f"Level: {self.level}", 180, 140, ui.COLOR_WHITE)
-        ui.draw_text(f"Lines: {self.lines}", 180, 160, ui.COLOR_WHITE)
+        ui.draw_text("Next:", HUD_X, 20, ui.COLOR_WHITE)
         ui.draw_text("Arrows: move/rotate", 170, 200, ui.COLOR_WHITE)
         ui.draw_text("Space/Enter: drop", 170, 214, ui.COLOR_WHITE)
         ui.draw_text("Q: quit", 170, 228, ui.COLOR_WHITE)
+        ui.draw_text("Z: rot left C: hold", 170, 242, ui.COLOR_WHITE)
+        ui.draw_text("Hold:", HUD_X, HOLD_Y + 4, ui.COLOR_WHITE)
+        # Forget what was on screen so render() paints everything
+        self.shadow = [bytearray(GRID_W) for _ in range(GRID_H)]
+        self.dirty_to = GRID_H
+        self.drawn_piece = {}
+        self.drawn_next = None
+        self.drawn_hold = None
+        self.drawn_stats = None
+        self.drawn_key = None
+        self.render()
         if self.game_over:
             ui.center_text("GAME OVER", 160, ui.COLOR_RED)
             ui.center_text("Press Q or Enter", 178, ui.COLOR_WHITE)
+            ui.center_text("R: watch replay", 196, ui.COLOR_WHITE)
 
-    def run(self):
-        running = True
-        self.drop_timer = time.ticks_ms()
-        last_draw = 0
-        self.draw()
-        while running and not self.game_over:
-            now = time.ticks_ms()
-            # Handle input
-            soft_drop = False
-            hard_drop = False
-            while keyboard.readinto(self.key_buffer):
-                key = self.key_buffer[0]
-                if key in (ord('q'), ord('Q')):
-                    running = False
-                    break
-                if key == 67:  # Right arrow
-                    self.move(1)
-                elif key == 68:  # Left arrow
-                    self.move(-1)
-                elif key == 65 or key in (ord('w'), ord('W'), ord('x'), ord('X')):  # Up / rotate
-                    self.rotate()
-                elif key == 66:  # Down arrow
-                    soft_drop = True
-                elif key in (32, 13):  # Space or Enter for hard drop
-                    hard_drop = True
-                elif key in (ord('p'), ord('P')):
-                    self._pause()
-            if not running:
-                break
+    def render(self, alpha=0):
+        """
+        Paint only what changed since the last frame.
 
-            if hard_drop:
-                self.drop()
-                self.drop_timer = time.ticks_ms()
-            else:
-                interval = self._drop_interval()
-                if soft_drop:
-                    self.step()
-                    self.drop_timer = time.ticks_ms()
-                elif time.ticks_diff(now, self.drop_timer) >= interval:
-                    self.step()
-                    self.drop_timer = time.ticks_ms()
+        self.shadow mirrors the value drawn in each well cell, so the old
+        piece and ghost positions are restored from self.colors, the new
+        ones painted, and rows shifted by a line clear repainted cell by
+        cell where they differ. The HUD is redrawn only when its values
+        change.
+        """
+        colors = self.colors
+        shadow = self.shadow
+        for r in range(self.dirty_to):
+            row = colors[r]
+            drawn = shadow[r]
+            if row != drawn:
+                for c in range(GRID_W):
+                    if row[c] != drawn[c]:
+                        self._paint_cell(r, c, row[c])
+        self.dirty_to = 0
+        # The overlay only changes when the piece moves or the well does
+        key = (self.current, self.x, self.y, self.rotation, self.pieces)
+        if key != self.drawn_key:
+            overlay = {}
+            if self.current is not None:
+                val = self.current + 1
+                for i in self._piece_cells(self.landing_y()):
+                    overlay[i] = val + GHOST
+                for i in self._piece_cells(self.y):
+                    overlay[i] = val
+            for i in self.drawn_piece:
+                if i not in overlay:
+                    r, c = divmod(i, GRID_W)
+                    if shadow[r][c] != colors[r][c]:
+                        self._paint_cell(r, c, colors[r][c])
+            for i, val in overlay.items():
+                r, c = divmod(i, GRID_W)
+                if shadow[r][c] != val:
+                    self._paint_cell(r, c, val)
+            self.drawn_piece = overlay
+            self.drawn_key = key
+        if self.next != self.drawn_next:
+            self._draw_preview(self.next, NEXT_Y)
+            self.drawn_next = self.next
+        if self.hold != self.drawn_hold:
+            self._draw_preview(self.hold, HOLD_Y)
+            self.drawn_hold = self.hold
+        stats = (self.score, self.level, self.lines)
+        if stats != self.drawn_stats:
+            ui.draw_rect(HUD_X, HUD_Y, 320 - HUD_X, 48, ui.COLOR_BLACK, fill=True)
+            ui.draw_text(f"Score: {self.score}", HUD_X, HUD_Y, ui.COLOR_WHITE)
+            ui.draw_text(f"Level: {self.level}", HUD_X, HUD_Y + 20, ui.COLOR_WHITE)
+            ui.draw_text(f"Lines: {self.lines}", HUD_X, HUD_Y + 40, ui.COLOR_WHITE)
+            self.drawn_stats = stats
+
+    def _draw_preview(self, piece, y0):
+        ui.draw_rect(NEXT_X, y0, 4 * CELL_SIZE, 4 * CELL_SIZE, ui.COLOR_BLACK, fill=True)
+        if piece is not None:
+            color = TETROMINO_COLORS[piece]
+            for c, r in PIECE_CELLS[piece][0]:
+                x = NEXT_X + c * CELL_SIZE
+                y = y0 + r * CELL_SIZE
+                ui.draw_rect(x, y, CELL_SIZE, CELL_SIZE, color, fill=True)
+
+    def _paint_cell(self, r, c, val):
+        # Fill the inside of a well cell, leaving its grid lines alone.
+        # Ghost cells are drawn as an outline in the piece colour.
+        x = GRID_X + c * CELL_SIZE + 1
+        y = GRID_Y + r * CELL_SIZE + 1
+        if val > GHOST:
+            ui.draw_rect(x, y, CELL_SIZE - 1, CELL_SIZE - 1, ui.COLOR_BLACK, fill=True)
+            ui.draw_rect(x + 1, y + 1, CELL_SIZE - 3, CELL_SIZE - 3, TETROMINO_COLORS[val - GHOST - 1], fill=False)
+        else:
+            color = TETROMINO_COLORS[val - 1] if val else ui.COLOR_BLACK
+            ui.draw_rect(x, y, CELL_SIZE - 1, CELL_SIZE - 1, color, fill=True)
+        self.shadow[r][c] = val
 
-            # Redraw at ~20fps
-            if time.ticks_diff(now, last_draw) >= 50:
-                self.draw()
-                last_draw = now
+    def _piece_cells(self, y):
+        # Well indices (row * GRID_W + col) the falling piece covers at row y
+        return [(y + r) * GRID_W + self.x + c
+                for c, r in PIECE_CELLS[self.current][self.rotation]
+                if 0 <= y + r < GRID_H]
+
+    def run(self):
+        self.quit = False
+        self.draw()
+        self.loop = GameLoop(TICK_MS)
+        self.loop.run(self._update, self.render, self._poll)
 
-            time.sleep_ms(10)
+        try:
+            self.save_replay()
+        except OSError:
+            pass  # No SD card
 
         # Final draw to show game over state or exit
         self.draw()
-        if self.game_over and running:
-            # Wait for confirmation to exit
+        if self.game_over and not self.quit:
+            # Wait for confirmation to exit, or R to watch the replay
             while True:
                 if keyboard.readinto(self.key_buffer):
                     key = self.key_buffer[0]
                     if key in (ord('q'), ord('Q'), 13, 32):
                         break
+                    if key in (ord('r'), ord('R')):
+                        play_replay()
+                        break
                 time.sleep_ms(30)
 
+    def _poll(self):
+        # Handle input; False ends the game
+        while keyboard.readinto(self.key_buffer):
+            key = self.key_buffer[0]
+            if key in (ord('q'), ord('Q')):
+                self.quit = True
+                return False
+            if key in (ord('p'), ord('P')):
+                self._pause()
+                self.loop.resync()
+            else:
+                self.handle_key(key)
+        return True
+
+    def _update(self):
+        self.tick()
+        return not self.game_over
+
     def _pause(self):
         self.draw()
         ui.center_text("PAUSED", 150, ui.COLOR_WHITE)
@@ -283,9 +588,85 @@ class Tetris:
             if keyboard.readinto(self.key_buffer):
                 key = self.key_buffer[0]
                 if key in (ord('p'), ord('P')):
-                    self.drop_timer = time.ticks_ms()
                     break
             time.sleep_ms(40)
+        # Clear the overlay
+        self.draw()
+
+def simulate(seed, events, end=None):
+    """
+    Run a game headless from a seed and (tick, key) events, as fast as
+    possible. Stops at tick end, or at game over. Returns the Tetris.
+    """
+    game = Tetris(seed)
+    i = 0
+    while not game.game_over and (end is None or game.ticks < end):
+        while i < len(events) and events[i][0] <= game.ticks:
+            game.handle_key(events[i][1])
+            i += 1
+        if end is None and i == len(events):
+            break
+        game.tick()
+    return game
+
+def random_inputs(seed, count, spacing=8):
+    """A reproducible stream of (tick, key) events for profiling without a recording."""
+    random.seed(seed)
+    keys = (67, 68, 65, ord('z'), 66, 32, ord('c'))
+    events = []
+    tick = 0
+    for _ in range(count):
+        tick += random.randint(1, spacing)
+        events.append((tick, keys[random.randint(0, len(keys) - 1)]))
+    return events
+
+def check_replay(path=REPLAY_PATH):
+    """Re-simulate a replay file; True if it ends with the recorded score, lines and pieces."""
+    seed, end, events, expected = load_replay(path)
+    game = simulate(seed, events, end)
+    return (game.score, game.lines, game.pieces) == expected
+
+def benchmark(games=20, inputs=2000):
+    """Time headless games on random input and print logic ticks per second."""
+    total_ticks = 0
+    start = time.ticks_ms()
+    for seed in range(games):
+        game = simulate(seed, random_inputs(seed, inputs))
+        total_ticks += game.ticks
+        print("seed %d: score %d, lines %d, pieces %d, ticks %d"
+              % (seed, game.score, game.lines, game.pieces, game.ticks))
+    ms = max(1, time.ticks_diff(time.ticks_ms(), start))
+    print("%d ticks in %d ms, %d ticks/s" % (total_ticks, ms, total_ticks * 1000 // ms))
+
+def play_replay(path=REPLAY_PATH):
+    """Play a recorded game back on screen in real time. Q stops it."""
+    try:
+        seed, end, events, _ = load_replay(path)
+    except (OSError, ValueError):
+        ui.clear()
+        ui.center_text("No replay found", 150, ui.COLOR_RED)
+        time.sleep_ms(1500)
+        return
+    game = Tetris(seed)
+    game.draw()
+    ui.draw_text("REPLAY", HUD_X, 180, ui.COLOR_RED)
+    pending = list(events)
+    pending.reverse()  # Pop from the end in tick order
+
+    def poll():
+        return not (keyboard.readinto(game.key_buffer) and game.key_buffer[0] in (ord('q'), ord('Q')))
+
+    def update():
+        while pending and pending[-1][0] <= game.ticks:
+            game.handle_key(pending.pop()[1])
+        game.tick()
+        return not game.game_over and game.ticks < end
+
+    loop = GameLoop(TICK_MS)
+    loop.run(update, game.render, poll)
+    if game.game_over or game.ticks >= end:
+        game.draw()
+        time.sleep_ms(1500)
 
 # Entry point
 if __name__ == "__main__":
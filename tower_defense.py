@@ -4,6 +4,7 @@ import time
 import picocalc
 from picocalc import keyboard
 import random
+from gameloop import GameLoop
 
 # Display setup
 fb = picocalc.display
@@ -37,11 +38,28 @@ TOWER_PROPS = {
     TOWER_SPLASH: (80, 15, 40, 2.0, "Splash"),
 }
 
+# Splash towers also hit mobs this close to the target (in cells)
+SPLASH_RADIUS = 1.5
+
 # Mob properties
 MOB_HP_BASE = 30
 MOB_SPEED_BASE = 0.5  # cells per update
 MOB_REWARD = 15
 
+def path_cells_within(path, x, y, radius):
+    """
+    Indices of the path cells within radius of (x, y), furthest along
+    the path first. Distances are compared squared, no square roots.
+    """
+    radius_sq = radius * radius
+    cells = []
+    for i in range(len(path) - 1, -1, -1):
+        dx = path[i][0] - x
+        dy = path[i][1] - y
+        if dx * dx + dy * dy <= radius_sq:
+            cells.append(i)
+    return tuple(cells)
+
 class Mob:
     def __init__(self, wave_num, path):
         self.path = path
@@ -92,8 +110,10 @@ class Tower:
         self.damage = damage
         self.fire_rate = fire_rate
         self.range = range_val
+        self.range_sq = range_val * range_val
         self.name = name
         self.cooldown = 0
+        self.path_cells = ()  # Path indices in range, set when placed
     
     def update(self):
         """Update tower cooldown"""
@@ -113,8 +133,7 @@ class Tower:
         """Check if target is in range"""
         dx = target_x - self.x
         dy = target_y - self.y
-        dist = (dx * dx + dy * dy) ** 0.5
-        return dist <= self.range
+        return dx * dx + dy * dy <= self.range_sq
 
 class Game:
     def __init__(self):
@@ -149,6 +168,12 @@ class Game:
         self.occupied = [[False] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
         for x, y in self.path:
             self.occupied[y][x] = True
+
+        # Mobs are sorted into one bucket per path cell each update, so a
+        # tower only looks at the cells it covers
+        self.buckets = [[] for _ in self.path]
+        self.splash_cells = [path_cells_within(self.path, x, y, SPLASH_RADIUS)
+                             for x, y in self.path]
     
     def create_path(self):
         """Create a snake-like path for mobs"""
@@ -223,36 +248,25 @@ class Game:
                 self.wave_active = False
         
         # Update towers
+        self.bucket_mobs()
         for tower in self.towers:
             tower.update()
             
             # Find target and fire
             if tower.can_fire():
-                target = None
-                for mob in self.mobs:
-                    if mob.alive:
-                        mx, my = mob.get_position()
-                        if tower.in_range(mx, my):
-                            target = mob
-                            break
+                target = self.find_target(tower)
                 
                 if target:
                     damage = tower.fire(target)
                     
                     # Apply damage
                     if tower.type == TOWER_SPLASH:
-                        # Splash damage to nearby mobs
-                        tx, ty = target.get_position()
-                        for mob in self.mobs:
-                            if mob.alive:
-                                mx, my = mob.get_position()
-                                dx = mx - tx
-                                dy = my - ty
-                                dist = (dx * dx + dy * dy) ** 0.5
-                                if dist <= 1.5:
-                                    if mob.take_damage(damage):
-                                        self.money += mob.reward
-                                        self.score += mob.reward
+                        # Splash damage to mobs on nearby path cells
+                        for i in self.splash_cells[target.path_idx]:
+                            for mob in self.buckets[i]:
+                                if mob.alive and mob.take_damage(damage):
+                                    self.money += mob.reward
+                                    self.score += mob.reward
                     else:
                         # Single target damage
                         if target.take_damage(damage):
@@ -270,6 +284,23 @@ class Game:
             elif not mob.alive:
                 self.mobs.remove(mob)
     
+    def bucket_mobs(self):
+        """Sort living mobs into the bucket for their path cell."""
+        for bucket in self.buckets:
+            if bucket:
+                bucket.clear()
+        for mob in self.mobs:
+            if mob.alive:
+                self.buckets[mob.path_idx].append(mob)
+    
+    def find_target(self, tower):
+        """First living mob in range, the one furthest along the path."""
+        for i in tower.path_cells:
+            for mob in self.buckets[i]:
+                if mob.alive:
+                    return mob
+        return None
+    
     def place_tower(self, x, y, tower_type):
         """Try to place a tower at (x, y)"""
         # Check if valid position
@@ -286,6 +317,7 @@ class Game:
         
         # Place tower
         tower = Tower(x, y, tower_type)
+        tower.path_cells = path_cells_within(self.path, x, y, tower.range)
         self.towers.append(tower)
         self.occupied[y][x] = True
         self.money -= cost
@@ -396,27 +428,8 @@ def main():
     game.draw()
     time.sleep(0.5)
     
-    running = True
-    frame_time = 1.0 / 20  # 20 FPS
-    
-    while running:
-        frame_start = time.ticks_ms()
-        
-        # Handle input
-        if not game.handle_input():
-            break
-        
-        # Update game
-        game.update()
-        
-        # Draw
-        game.draw()
-        
-        # Frame limiting
-        elapsed = time.ticks_diff(time.ticks_ms(), frame_start)
-        sleep_time = frame_time - elapsed / 1000.0
-        if sleep_time > 0:
-            time.sleep(sleep_time)
+    # 20 updates per second, whatever the draw cost
+    GameLoop(1000 // 20).run(game.update, lambda alpha: game.draw(), game.handle_input)
     
     # Show cursor on exit
     try: